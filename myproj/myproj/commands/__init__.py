@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Gearbox commands for myproj."""
+import os
+
+import tg
+from gearbox.command import Command
+from paste.deploy import loadapp
+
+__all__ = ['AppCommand']
+
+
+class AppCommand(Command):
+    """Base for commands that need the myproj application and its model loaded"""
+
+    def get_parser(self, prog_name):
+        parser = super(AppCommand, self).get_parser(prog_name)
+
+        parser.add_argument("-c", "--config",
+            help='application config file to read (default: development.ini)',
+            dest='config_file', default="development.ini")
+
+        return parser
+
+    def load_app(self, opts, **settings):
+        """Load the wsgi app so that the model is bound to the configured datastore,
+        ``settings`` replace the configuration file ones before the model is set up"""
+        def override(app_config, conf):
+            conf.update(settings)
+
+        tg.hooks.register('initialized_config', override)
+        try:
+            return loadapp('config:%s' % opts.config_file, relative_to=os.getcwd())
+        finally:
+            tg.hooks.disconnect('initialized_config', override)
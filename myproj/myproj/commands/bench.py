@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""gearbox paranuara-bench: run the paranuara micro-benchmarks."""
+from __future__ import print_function
+
+from myproj.commands import AppCommand
+
+__all__ = ['BenchCommand']
+
+
+class BenchCommand(AppCommand):
+    """Time the paranuara read paths against the configured datastore
+
+    Example::
+
+        $ gearbox paranuara-bench raw-reads -n 2000
+        $ gearbox paranuara-bench endpoints -c test.ini --sizes 1000,10000,100000
+        $ gearbox paranuara-bench lean-api -c test.ini -n 500
+
+    """
+    def get_description(self):
+        return "Run paranuara micro-benchmarks"
+
+    def get_parser(self, prog_name):
+        from myproj.lib.benchmarks import BENCHMARKS
+        parser = super(BenchCommand, self).get_parser(prog_name)
+
+        parser.add_argument('benchmarks', nargs='+', choices=sorted(BENCHMARKS),
+            help='benchmarks to run')
+
+        parser.add_argument('-n', '--repeat', type=int, default=1000,
+            help='timed calls per case (default: 1000)', dest='repeat')
+
+        parser.add_argument('--sizes', default='1000',
+            help='comma separated synthetic dataset sizes in people (default: 1000)', dest='sizes')
+
+        parser.add_argument('--companies', type=int, default=None,
+            help='synthetic companies (default: one per 100 people)', dest='companies')
+
+        parser.add_argument('--degree', default='powerlaw',
+            help='synthetic friend count distribution (default: powerlaw)', dest='degree')
+
+        parser.add_argument('--mean-degree', type=int, default=10,
+            help='synthetic mean friends per person (default: 10)', dest='mean_degree')
+
+        parser.add_argument('--seed', type=int, default=0,
+            help='synthetic dataset random seed (default: 0)', dest='seed')
+
+        parser.add_argument('--drop', action='store_true', dest='drop',
+            help='allow replacing the companies and people of a non mim:// datastore')
+
+        return parser
+
+    def take_action(self, opts):
+        app = self.load_app(opts)
+        from myproj.lib.benchmarks import BENCHMARKS, format_stats
+
+        sizes = [int(size) for size in opts.sizes.split(',')]
+        for name in opts.benchmarks:
+            print(name)
+            for case, stats in BENCHMARKS[name](
+                    app=app, repeat=opts.repeat, sizes=sizes, companies=opts.companies, seed=opts.seed,
+                    drop=opts.drop, config_file=opts.config_file, degree=opts.degree,
+                    mean_degree=opts.mean_degree):
+                print(format_stats(case, stats))
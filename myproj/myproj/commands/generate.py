@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""gearbox paranuara-generate: load a synthetic paranuara dataset."""
+from __future__ import print_function
+
+import time
+
+from myproj.commands import AppCommand
+
+__all__ = ['GenerateCommand']
+
+
+class GenerateCommand(AppCommand):
+    """Insert synthetic companies and people in the configured datastore
+
+    Example::
+
+        $ gearbox paranuara-generate -n 1000000 -m 10000 --degree powerlaw --mean-degree 20
+
+    """
+    def get_description(self):
+        return "Generate a synthetic paranuara dataset"
+
+    def get_parser(self, prog_name):
+        from myproj.lib.synthetic import DEGREE_DISTRIBUTIONS, EYE_COLORS
+        parser = super(GenerateCommand, self).get_parser(prog_name)
+
+        parser.add_argument('-n', '--people', type=int, default=10000,
+            help='number of people (default: 10000)', dest='people')
+
+        parser.add_argument('-m', '--companies', type=int, default=100,
+            help='number of companies (default: 100)', dest='companies')
+
+        parser.add_argument('--degree', choices=sorted(DEGREE_DISTRIBUTIONS), default='powerlaw',
+            help='friend count distribution (default: powerlaw)', dest='degree')
+
+        parser.add_argument('--mean-degree', type=int, default=10,
+            help='mean friends per person (default: 10)', dest='mean_degree')
+
+        parser.add_argument('--max-degree', type=int, default=1000,
+            help='friends per person cap (default: 1000)', dest='max_degree')
+
+        parser.add_argument('--eye-colors', default=EYE_COLORS,
+            help='weighted eye colors (default: %s)' % EYE_COLORS, dest='eye_colors')
+
+        parser.add_argument('--fruit-ratio', type=float, default=0.5,
+            help='share of fruits among favourite fruits and vegetables (default: 0.5)', dest='fruit_ratio')
+
+        parser.add_argument('--died-ratio', type=float, default=0.1,
+            help='share of dead people (default: 0.1)', dest='died_ratio')
+
+        parser.add_argument('--seed', type=int, default=0,
+            help='random seed (default: 0)', dest='seed')
+
+        parser.add_argument('-b', '--batch-size', type=int, default=1000,
+            help='documents per insert batch (default: 1000)', dest='batch_size')
+
+        parser.add_argument('--drop', action='store_true', dest='drop',
+            help='remove every company and person first')
+
+        return parser
+
+    def take_action(self, opts):
+        self.load_app(opts)
+        from myproj import model
+        from myproj.lib.synthetic import load_synthetic
+
+        if opts.drop:
+            model.Company.query.remove({})
+            model.People.query.remove({})
+
+        started = time.time()
+        companies, people = load_synthetic(
+            opts.people, opts.companies, seed=opts.seed, batch_size=opts.batch_size,
+            degree=opts.degree, mean_degree=opts.mean_degree, max_degree=opts.max_degree,
+            eye_colors=opts.eye_colors, fruit_ratio=opts.fruit_ratio, died_ratio=opts.died_ratio)
+        print('{} companies {} people inserted in {:.1f}s'.format(companies, people, time.time() - started))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""gearbox paranuara-import: load the paranuara resource files through the model."""
+from __future__ import print_function
+
+import io
+import json
+import os
+import time
+
+from myproj.commands import AppCommand
+from myproj.lib.jsonstream import iter_json_array
+
+__all__ = ['ImportCommand']
+
+
+class ImportCommand(AppCommand):
+    """Import companies.json and people.json validating them against the model
+
+    Files are read incrementally and inserted in batches, a checkpoint
+    file next to each resource records how many items were processed so
+    an interrupted import can be resumed with --resume.
+
+    Example::
+
+        $ gearbox paranuara-import --companies resources/companies.json --people resources/people.json
+
+    """
+    def get_description(self):
+        return "Import paranuara companies and people JSON resources"
+
+    def get_parser(self, prog_name):
+        parser = super(ImportCommand, self).get_parser(prog_name)
+
+        parser.add_argument('--companies',
+            help='companies JSON array file', dest='companies')
+
+        parser.add_argument('--people',
+            help='people JSON array file', dest='people')
+
+        parser.add_argument('-b', '--batch-size', type=int, default=1000,
+            help='documents per insert batch (default: 1000)', dest='batch_size')
+
+        parser.add_argument('--resume', action='store_true', dest='resume',
+            help='skip the items recorded in the checkpoint of a previous run')
+
+        return parser
+
+    def take_action(self, opts):
+        self.load_app(opts)
+        from myproj import model
+
+        # companies first so people company_id refer to existing companies
+        for model_class, filename in [(model.Company, opts.companies), (model.People, opts.people)]:
+            if filename:
+                self.import_file(model_class, filename, opts.batch_size, opts.resume)
+
+    def checkpoint_path(self, filename):
+        return filename + '.checkpoint'
+
+    def read_checkpoint(self, filename):
+        try:
+            with open(self.checkpoint_path(filename)) as f:
+                return json.load(f).get('items', 0)
+        except (IOError, ValueError):
+            return 0
+
+    def write_checkpoint(self, filename, items):
+        path = self.checkpoint_path(filename)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict(file=os.path.abspath(filename), items=items), f)
+        os.rename(path + '.tmp', path)
+
+    def import_file(self, model_class, filename, batch_size, resume):
+        from myproj import model
+
+        skip = self.read_checkpoint(filename) if resume else 0
+        counts = dict(inserted=0, duplicate=0, invalid=0, error=0)
+        processed = 0
+        started = time.time()
+
+        def flush(batch):
+            results, _ = model.bulk_insert(model_class, batch, batch_size=batch_size)
+            for result in results:
+                counts[result['status']] += 1
+            self.write_checkpoint(filename, processed)
+            elapsed = time.time() - started
+            print('{} {}: {} items {:.0f} items/s {}'.format(
+                model_class.__name__, filename, processed,
+                (processed - skip) / elapsed if elapsed else 0, counts))
+
+        if skip:
+            print('{} {}: resuming after {} items'.format(model_class.__name__, filename, skip))
+
+        batch = []
+        with io.open(filename, 'rb') as f:
+            for item in iter_json_array(f):
+                processed += 1
+                if processed <= skip:
+                    continue
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+        if batch or not processed:
+            flush(batch)
+
+        elapsed = time.time() - started
+        print('{} {}: done, {} items in {:.1f}s {}'.format(
+            model_class.__name__, filename, processed, elapsed, counts))
+        return counts
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""gearbox paranuara-indexes: build the declared indexes out of the request path."""
+from __future__ import print_function
+
+import time
+
+from myproj.commands import AppCommand
+
+__all__ = ['IndexesCommand']
+
+
+class IndexesCommand(AppCommand):
+    """Build the indexes declared in the model when their manifest changed
+
+    Builds run in the background on the server, their progress is printed
+    every --poll seconds. The manifest version recorded at the end lets
+    the application workers skip the index checks at startup.
+
+    Example::
+
+        $ gearbox paranuara-indexes
+        $ gearbox paranuara-indexes --check
+        $ gearbox paranuara-indexes --force --poll 30
+
+    """
+    def get_description(self):
+        return "Build the paranuara indexes and record their manifest"
+
+    def get_parser(self, prog_name):
+        parser = super(IndexesCommand, self).get_parser(prog_name)
+
+        parser.add_argument('--check', action='store_true', dest='check',
+            help='only tell whether the indexes are current, exit status 1 when not')
+
+        parser.add_argument('--force', action='store_true', dest='force',
+            help='ensure every index even if the manifest matches')
+
+        parser.add_argument('--poll', type=float, default=10.0,
+            help='seconds between build progress reports (default: 10)', dest='poll')
+
+        return parser
+
+    def take_action(self, opts):
+        # --check only reads the manifest, init_model must not start a build
+        self.load_app(opts, **{'ming.index_sync': 'off'} if opts.check else {})
+        from myproj.model import indexes
+
+        if opts.check:
+            current = indexes.indexes_current()
+            print('manifest {} is {}'.format(indexes.manifest_version(), 'current' if current else 'not synchronized'))
+            return 0 if current else 1
+
+        thread = indexes.current_index_sync()
+        if thread is not None:
+            # started by init_model with ming.index_sync = background
+            print('waiting for the background synchronization')
+            thread.join()
+
+        started = time.time()
+        ensured = indexes.sync_indexes(force=opts.force, report=print, poll=opts.poll)
+        print('{} indexes ensured in {:.1f}s'.format(ensured, time.time() - started))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""gearbox paranuara-migrate: run batched data migrations."""
+from __future__ import print_function
+
+import time
+
+from myproj.commands import AppCommand
+
+__all__ = ['MigrateCommand']
+
+
+class MigrateCommand(AppCommand):
+    """Run batched online data migrations on the paranuara collections
+
+    Example::
+
+        $ gearbox paranuara-migrate foods
+        $ gearbox paranuara-migrate friend-ids --batch-size 500
+        $ gearbox paranuara-migrate headcounts
+
+    """
+    def get_description(self):
+        return "Run batched paranuara data migrations"
+
+    def get_parser(self, prog_name):
+        from myproj.model.migrations import MIGRATIONS
+        parser = super(MigrateCommand, self).get_parser(prog_name)
+
+        parser.add_argument('migrations', nargs='+', choices=sorted(MIGRATIONS),
+            help='migrations to run')
+
+        parser.add_argument('-b', '--batch-size', type=int, default=1000,
+            help='documents per update batch of the foods and friend-ids migrations (default: 1000)',
+            dest='batch_size')
+
+        return parser
+
+    def take_action(self, opts):
+        self.load_app(opts)
+        from myproj.model.migrations import MIGRATIONS, BATCHED_MIGRATIONS
+
+        for name in opts.migrations:
+            started = time.time()
+            if name in BATCHED_MIGRATIONS:
+                updated = MIGRATIONS[name](batch_size=opts.batch_size)
+            else:
+                updated = MIGRATIONS[name]()
+            print('{}: {} documents updated in {:.1f}s'.format(name, updated, time.time() - started))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+TG2 settings of the lean JSON API application, see make_api_app in
+myproj.config.middleware.
+
+Minimal mode: no sessions, authentication, ToscaWidgets, i18n, static
+files nor error pages, only Ming. The ``.json`` request extensions are
+kept. These settings are the API application's own, make_api_app leaves
+the process wide ``tg.config`` of the full application alone.
+"""
+from tg.configuration import AppConfig
+
+import myproj
+from myproj import model
+from myproj.config.app_cfg import base_config
+from myproj.controllers.api import ApiRootController
+
+__all__ = ['api_config', 'load_api_environment']
+
+api_config = AppConfig(minimal=True, root_controller=ApiRootController())
+api_config.package = myproj
+# every API route is exposed as json, the renderers of the full
+# application are kept because loading the API first resolves the
+# templates of every exposed controller, RootController included
+api_config.renderers = list(base_config.renderers)
+api_config.default_renderer = base_config.default_renderer
+# no ToscaWidgets2 middleware to serve the tgext.crud CSS and javascript
+api_config['crud.resources'] = False
+# clients ask for /people/2.json as on the full application
+api_config.disable_request_extensions = False
+
+# None of the API routes use them, the minimal mode defaults spelled out
+api_config['session.enabled'] = False
+api_config['cache.enabled'] = False
+api_config.i18n_enabled = False
+api_config.use_toscawidgets = False
+api_config.use_toscawidgets2 = False
+api_config.serve_static = False
+api_config.auth_backend = None
+
+api_config.use_sqlalchemy = False
+api_config['tm.enabled'] = False
+api_config.use_ming = True
+api_config.model = model
+api_config.DBSession = model.DBSession
+
+load_api_environment = api_config.make_load_environment()
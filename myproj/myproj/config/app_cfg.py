@@ -5,11 +5,16 @@ Global configuration file for TG2-specific settings in myproj.
 This file complements development/deployment.ini.
 
 """
+import logging
+
 from tg.configuration import AppConfig
+from tg.support.converters import asbool
 
 import myproj
 from myproj import model, lib
 
+log = logging.getLogger(__name__)
+
 base_config = AppConfig()
 base_config.renderers = []
 
@@ -94,14 +99,38 @@ class ApplicationAuthMetadata(TGAuthMetadata):
 
         return login
 
+    def _resolve(self, userid):
+        """
+        User id, group names and permission names of ``userid``, served from
+        ``model.auth_cache`` so authenticated requests don't hit the auth
+        collections every time. Only plain values are cached, mapped objects
+        belong to the session of the request that loaded them.
+        """
+        entry = model.auth_cache.get(userid)
+        if entry is None:
+            user = self.sa_auth.user_class.query.get(user_name=userid)
+            if user is None:
+                return None
+            entry = dict(user_id=user._id,
+                         groups=tuple(g.group_name for g in user.groups),
+                         permissions=tuple(p.permission_name for p in user.permissions))
+            model.auth_cache.put(userid, entry)
+        return entry
+
     def get_user(self, identity, userid):
-        return self.sa_auth.user_class.query.get(user_name=userid)
+        entry = self._resolve(userid)
+        if entry is None:
+            return None
+        # by _id, in the session of the current request
+        return self.sa_auth.user_class.query.get(_id=entry['user_id'])
 
     def get_groups(self, identity, userid):
-        return [g.group_name for g in identity['user'].groups]
+        entry = self._resolve(userid)
+        return list(entry['groups']) if entry else []
 
     def get_permissions(self, identity, userid):
-        return [p.permission_name for p in identity['user'].permissions]
+        entry = self._resolve(userid)
+        return list(entry['permissions']) if entry else []
 
 base_config.sa_auth.authmetadata = ApplicationAuthMetadata(base_config.sa_auth)
 
@@ -130,9 +159,23 @@ base_config.sa_auth.post_login_url = '/post_login'
 # You may optionally define a page where you want users to be redirected to
 # on logout:
 base_config.sa_auth.post_logout_url = '/post_logout'
-try:
-    # Enable DebugBar if available, install tgext.debugbar to turn it on
-    from tgext.debugbar import enable_debugbar
-    enable_debugbar(base_config)
-except ImportError:
-    pass
+
+
+_enabled_extensions = set()
+
+
+def enable_extensions(app_conf):
+    """
+    Turn on the optional extensions enabled in the configuration file,
+    they are only imported then. Called by make_app before the stack is set up.
+
+    debugbar.enabled = true enables tgext.debugbar if it is installed.
+    """
+    if asbool(app_conf.get('debugbar.enabled', False)) and 'debugbar' not in _enabled_extensions:
+        try:
+            from tgext.debugbar import enable_debugbar
+        except ImportError:
+            log.warning('debugbar.enabled is set but tgext.debugbar is not installed')
+        else:
+            enable_debugbar(base_config)
+            _enabled_extensions.add('debugbar')
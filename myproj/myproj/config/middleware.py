@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 """WSGI middleware initialization for the myproj application."""
-from myproj.config.app_cfg import base_config
+from myproj.config.app_cfg import base_config, enable_extensions
 from myproj.config.environment import load_environment
+from myproj.lib.querystats import QueryStatsMiddleware
 
-__all__ = ['make_app']
+__all__ = ['make_app', 'make_api_app']
 
 # Use base_config to setup the necessary PasteDeploy application factory.
 # make_base_app will wrap the TG2 app with all the middleware it needs.
@@ -28,8 +29,39 @@ def make_app(global_conf, full_stack=True, **app_conf):
     ``app_conf`` contains all the application-specific settings (those defined
     under ``[app:main]``.
     """
+    enable_extensions(app_conf)
     app = make_base_app(global_conf, full_stack=True, **app_conf)
 
     # Wrap your base TurboGears 2 application with custom middleware here
+    app = QueryStatsMiddleware(app)
+
+    return app
+
+
+def make_api_app(global_conf, **app_conf):
+    """
+    Set up only the JSON API of myproj: the /people and /companies
+    resources in TG2 minimal mode, see myproj.config.api_cfg.
+
+    This is the ``api`` PasteDeploy factory, for processes serving the
+    JSON API alone. Cookie sessions, repoze.who, ToscaWidgets resource
+    injection, i18n and the error page middleware of the full stack are
+    left out, the query accounting is kept.
+    """
+    # imported here so that the full application never builds the API root
+    from myproj.config.api_cfg import api_config, load_api_environment
+    from tg.request_local import config as process_config
+
+    # load_environment replaces the process wide configuration with the API
+    # one, give it a duplicate of the current entry to replace. The API
+    # application holds its own configuration for its requests.
+    process_config.push_process_config(process_config.current_conf())
+    try:
+        make_base_api_app = api_config.setup_tg_wsgi_app(load_api_environment)
+        app = make_base_api_app(global_conf, full_stack=False, **app_conf)
+    finally:
+        process_config.pop_process_config()
+
+    app = QueryStatsMiddleware(app)
 
     return app
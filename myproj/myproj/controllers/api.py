@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Root of the lean JSON API application, see myproj.config.api_cfg."""
+
+from tg import TGController
+
+from myproj import model
+from myproj.controllers.paranuara import PeopleAPIController, CompanyAPIController
+
+__all__ = ['ApiRootController']
+
+
+class ApiRootController(TGController):
+    """
+    Only the /people and /companies resources of RootController, without
+    the identity lookup of BaseController as there is no authentication.
+    """
+    people = PeopleAPIController(model.DBSession)
+    companies = CompanyAPIController(model.DBSession)
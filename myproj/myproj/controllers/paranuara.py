@@ -1,29 +1,157 @@
 import logging
 from tg import expose
 from tg import request, validate 
-from formencode.validators import NotEmpty, Int, DateConverter, String, Bool
+from formencode.validators import NotEmpty, Int, DateConverter, String, Bool, Number
 from formencode import Invalid
 from tgext.crud import EasyCrudRestController
 from pymongo.errors import DuplicateKeyError
-from tg import abort
+from tg import abort, response, config
+from tg.support.converters import asbool
+from webob.exc import HTTPNotModified
 from myproj import model as M
+from myproj.lib.streaming import stream_requested, ndjson_response
+from myproj.lib.jsonencode import json_response
 
 log = logging.getLogger(__name__)
 
 
-FRUITS = set(['apple',
- 'banana', 
- 'cucumber',
- 'orange',
- 'strawberry'])
+class ParanuaraCrudController(EasyCrudRestController):
+    '''
+    The tgext.crud CSS and javascript are injected unless ``crud.resources``
+    is off in the configuration, as in the lean API application
+    (myproj.config.api_cfg) which has no ToscaWidgets2 middleware.
+    '''
+
+    @property
+    def resources(self):
+        if not asbool(config.get('crud.resources', True)):
+            return ()
+        return EasyCrudRestController.resources
+
+
+def bulk_post(model, **overrides):
+    '''
+    Insert the JSON array of documents in the request body, reporting per item
+    whether it was inserted, a duplicate or invalid
+    '''
+    if request.method != 'POST':
+        abort(405, passthrough="json")
+    try:
+        items = request.json_body
+    except ValueError as e:
+        abort(400, '{}'.format(e), passthrough="json")
+    if not isinstance(items, list):
+        abort(400, 'Expected a JSON array of documents', passthrough="json")
+
+    results, inserted = M.bulk_insert(model, items, **overrides)
+    log.debug('bulk {} {} items {} inserted'.format(model.__name__, len(items), len(inserted)))
+    return dict(model=model.__name__, value=dict(inserted=len(inserted), results=results))
+
+
+def requested_fields(model, kw):
+    '''
+    Pop the comma separated ``fields`` param, 400 unless every name is a
+    FieldProperty of ``model``. None when no projection was asked for.
+    '''
+    value = kw.pop('fields', None)
+    if not value:
+        return None
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if name and name not in fields:
+            fields.append(name)
+    unknown = [name for name in fields if name not in model.raw.field_names]
+    if unknown or not fields:
+        abort(400, 'Unknown {} fields: {}'.format(model.__name__, ', '.join(unknown)), passthrough="json")
+    return fields
+
+
+def render_json(payload):
+    '''
+    ``payload``, made of serialized documents, encoded by json_response
+    rather than walked by the TG json renderer. The inherited offset
+    paging is disabled as there is no dict left to page.
+    '''
+    paginators = getattr(request, 'paginators', None)
+    if paginators and 'value_list' in paginators:
+        paginators['value_list'].paginate_items_per_page = -1
+    return json_response(payload)
+
+
+def keyset_page(model, kw, page_size, max_page_size):
+    '''
+    Page of ``model`` documents ordered by the unique index, starting after
+    the ``after`` index, so any page costs one indexed range scan.
+    total=1 adds an estimated document count read from the collection metadata.
+    '''
+    fields = requested_fields(model, kw)
+    try:
+        after = Int().to_python(kw.pop('after', None))
+        limit = Int(min=1).to_python(kw.pop('limit', None))
+        total = Bool().to_python(kw.pop('total', None))
+    except Invalid as ve:
+        abort(400, '{}'.format(ve), passthrough="json")
+    limit = min(limit or page_size, max_page_size)
+    # disables the offset paging of the inherited optional_paginate
+    request.paginators['value_list'].paginate_items_per_page = -1
+
+    spec = {}
+    if after is not None:
+        spec['index'] = {'$gt': after}
+    page_fields = fields if not fields or 'index' in fields else fields + ['index']
+    # one extra row tells whether there is a next page
+    entries = list(model.raw.find(spec, page_fields, sort=[('index', 1)], limit=limit + 1))
+    next_after = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_after = entries[-1]['index']
+    serialize = model.raw.serializer(fields)
+    result = dict(model=model.__name__, value_list=[serialize(e) for e in entries], next=next_after)
+    if total:
+        result['total'] = model.raw.estimated_count()
+    return render_json(result)
+
+
+def people_filters(kw):
+    '''
+    Mongo filters for the eyeColor/has_died request params
+    '''
+    filters = {}
+    for k,v in [('eyeColor', String()), ('has_died', Bool())]:
+        if(kw.get(k,None) is not None):
+            filters[k] = v.to_python(kw[k])
+    return filters
 
-VEGETABLES = set([ 'beetroot',
- 'carrot',
- 'celery',
-])
 
+def from_snapshot(model, fields):
+    '''
+    The model snapshot when it is enabled and holds every one of ``fields``
+    '''
+    snapshot = getattr(model, 'snapshot', None)
+    if snapshot is not None and snapshot.enabled and snapshot.covers(fields):
+        return snapshot
+    return None
 
-class PeopleFoodsAPIController(EasyCrudRestController):
+
+def not_modified(model, index, fields=None):
+    '''
+    304 response when If-None-Match has the current ETag of the ``index``
+    document, answered from the (index, _rev, _id) index without loading it.
+    Never checked against the snapshot, which may be up to max_age stale
+    '''
+    if not request.if_none_match:
+        return None
+    doc = model.raw.get(fields=['_id', '_rev'], index=index)
+    if doc is None:
+        return None
+    etag = M.revision_etag(doc['_id'], doc.get('_rev'), fields)
+    if etag in request.if_none_match:
+        return HTTPNotModified(etag=etag)
+    return None
+
+
+class PeopleFoodsAPIController(ParanuaraCrudController):
     '''
     Resource to display a persons favourite food split into fruits and vegetables
     curl 'http://localhost:8080/people/1/foods.json?vegetables=true&fruits=true'
@@ -43,28 +171,30 @@ class PeopleFoodsAPIController(EasyCrudRestController):
 
         log.debug('food params {}'.format(validated_entries))
 
-        person =  M.People.query.get(index=index)
+        # fruits and vegetables are classified on write, see FoodsExtension
+        person = M.People.raw.get(
+            fields=['name', 'age', 'favouriteFood', 'fruits', 'vegetables'], index=index)
+        if person is None:
+            abort(404, passthrough="json")
+        if 'fruits' not in person:
+            # not backfilled yet
+            person['fruits'], person['vegetables'] = M.classify_foods(person.get('favouriteFood'))
 
         res = {}
         for k in ['name','age']:
-            res[k] = getattr(person,k)
+            res[k] = person.get(k)
         
-        for entry, food in [('vegetables', VEGETABLES), ('fruits', FRUITS)]:
+        for entry in ['vegetables', 'fruits']:
             if validated_entries.get(entry) == True:
-                res.update({
-                    entry: list(
-                        food.intersection(
-                            set(person.favouriteFood))
-                        )
-                    })
+                res[entry] = person.get(entry) or []
 
         if(validated_entries.get('vegetables') is None and validated_entries.get('fruits') is None ):
-            res.update({'favourite': person.favouriteFood})
+            res.update({'favourite': person.get('favouriteFood')})
         return {'model':'Food', 'value':res}
 
 
 
-class CommonFriendsAPIController(EasyCrudRestController):
+class CommonFriendsAPIController(ParanuaraCrudController):
     '''
     Resource to display common friends between people
     To get common friends with {
@@ -72,67 +202,217 @@ class CommonFriendsAPIController(EasyCrudRestController):
             'has_died':false
         }
     curl 'http://localhost:8080/people/1/common_friends/2.json?index=2&eyeColor=brown&has_died=false'
+
+    To get common friends of a group of people
+    curl 'http://localhost:8080/people/1/common_friends.json?with=2,17,595&eyeColor=brown&has_died=false'
     '''
     model = M.People
+
+    def _common_friends(self, indexes, **kw):
+        '''
+        people details and their common friends matching the eyeColor/has_died filters
+        with stream=1 only the common friends are streamed as NDJSON
+        fields=name,age restricts the people and common friends details
+        '''
+        stream = stream_requested(kw)
+        fields = requested_fields(M.People, kw)
+        # merge-intersection over the in-memory adjacency index
+        common = M.People.friend_graph.common_friends(*indexes)
+        filters = {
+            'index':{'$in': list(common) }, 
+            # 'index': {'$nin':[persons[0].index, persons[1].index]}
+        }
+        log.debug('common friends of {},  {}'.format(indexes, common))
+        filters.update(people_filters(kw))
+
+        log.debug('filters {}'.format(filters))
+
+        common_fields = fields or ['name', 'age', 'address', 'phone', 'index', 'email', 'company_id', 'has_died', 'eyeColor']
+        if stream:
+            return ndjson_response(M.People.raw.find(filters, common_fields, sort=[('index', 1)]),
+                                   M.People.raw.serializer(common_fields))
+
+        person_fields = fields or ['name', 'age', 'address', 'phone', 'index', 'friends', '_id']
+        persons = M.People.raw.find({'index': {'$in': indexes}}, person_fields)
+        serialize = M.People.raw.serializer(person_fields)
+        people = [serialize(p) for p in persons]
+
+        common_friends = M.People.raw.find(filters, common_fields)
+        serialize = M.People.raw.serializer(common_fields)
+        cfriends = [serialize(p) for p in common_friends]
+        return render_json(dict(model='CommonFriends', 
+            value = dict(people=people , 
+            common_friends=cfriends)))
+
+    @expose('json', inherit=True)
+    def get_all(self, **kw):
+        '''
+        common friends of the person and every index listed in ``with``
+        '''
+        try:
+            index = Int().to_python(request.controller_state.routing_args.get('index'))
+            indexes = [index] + [Int().to_python(i) for i in kw.pop('with', '').split(',') if i.strip()]
+        except Invalid as ve:
+            abort(400, '{}'.format(ve), passthrough="json")
+
+        log.debug('common_friends group params {} {}'.format(indexes, kw))
+        return self._common_friends(indexes, **kw)
+
     @validate({
         'friend_index':Int(not_empty=True),
     })
     @expose('json', inherit=True)
     def get_one(self, friend_index, **kw):
-        index = request.controller_state.routing_args.get('index')
+        index = Int().to_python(request.controller_state.routing_args.get('index'))
         
         log.debug('common_friends params {} {} {} {} {}'.format(index, type(index), type(friend_index), kw, request.controller_state.routing_args))
         
-        persons =  M.People.query.find({
-            'index':{
-                '$in':[int(index), friend_index]
-            }},
-            {'name':1,'age':1,'address':1,'phone':1, 'index':1, 'email':1, 'company_id':1, 'friends':1}
-        ).all()
-
-        common = set(
-                [p0['index'] for p0 in persons[0].friends]).intersection(
-                    set([p1['index'] for p1 in persons[1].friends]))
-        common.discard(persons[0])
-        common.discard(persons[1])
-        filters = {
-            'index':{'$in': list(common) }, 
-            # 'index': {'$nin':[persons[0].index, persons[1].index]}
-        }
-        log.debug('common friends of {} and {},  {}'.format(persons[0].index, persons[1].index, common))
-        for k,v in [('eyeColor', String()), ('has_died', Bool())]:
-            if(kw.get(k,None) is not None):
-                filters[k] = v.to_python(kw[k])
+        return self._common_friends([index, friend_index], **kw)
 
-        log.debug('filters {}'.format(filters))
 
-        common_fields = {'name':1,'age':1,'address':1,'phone':1, 'index':1, 'email':1, 'company_id':1, 'has_died':1, 'eyeColor':1}
-        common_friends = M.People.query.find(filters, common_fields).all()
-        people = []
-        for p in persons:
-            d = {}
-            for attr in ['name', 'age', 'address', 'phone', 'index', 'friends','_id']:
-                d[attr] = getattr(p,attr,None)
-            people.append(d)
-        cfriends = []
-        for p in common_friends:
-            d = {}
-            for attr in common_fields.keys():
-                d[attr] = getattr(p,attr,None)
-            cfriends.append(d)
-        return dict(model='CommonFriends', 
-            value = dict(people=people , 
-            common_friends=cfriends))
+class SuggestionsAPIController(ParanuaraCrudController):
+    '''
+    People you may know: friends of friends ranked by mutual friends, existing friends excluded
+    curl 'http://localhost:8080/people/1/suggestions.json?limit=5&eyeColor=brown&has_died=false'
+    '''
+    model = M.People
+
+    page_size = 10
+    max_page_size = 100
+    # friends expanded per person, bounds the work for high degree people
+    max_fanout = 200
+    # best ranked candidates looked up when filtering
+    max_candidates = 1000
+
+    @expose('json', inherit=True)
+    def get_all(self, limit=None, **kw):
+        fields = requested_fields(M.People, kw) or ['name', 'age', 'index', 'eyeColor', 'has_died', 'company_id']
+        try:
+            index = Int().to_python(request.controller_state.routing_args.get('index'))
+            limit = min(Int(min=1).to_python(limit) or self.page_size, self.max_page_size)
+            filters = people_filters(kw)
+        except Invalid as ve:
+            abort(400, '{}'.format(ve), passthrough="json")
+        if M.People.raw.get(fields=['index'], index=index) is None:
+            abort(404, passthrough="json")
+
+        # filtered out candidates are replaced by the next best ranked ones
+        ranked = M.People.friend_graph.suggestions(
+            index, limit=self.max_candidates if filters else limit, max_fanout=self.max_fanout)
+        log.debug('suggestions for {} {} candidates filters {}'.format(index, len(ranked), filters))
+
+        query_fields = fields if 'index' in fields else fields + ['index']
+        found = dict((p['index'], p) for p in M.People.raw.find(
+            dict(filters, index={'$in': [candidate for candidate, _ in ranked]}), query_fields))
+        suggestions = []
+        serialize = M.People.raw.serializer(fields)
+        for candidate, mutual in ranked:
+            person = found.get(candidate)
+            if person is None:
+                continue
+            suggestion = serialize(person)
+            suggestion['mutual_friends'] = mutual
+            suggestions.append(suggestion)
+            if len(suggestions) >= limit:
+                break
+        return render_json({'model':'Suggestions', 'value': dict(index=index, suggestions=suggestions)})
+
+
+class PathAPIController(ParanuaraCrudController):
+    '''
+    Shortest friendship chain between two people, each person lists the next one as a friend
+    curl 'http://localhost:8080/people/1/path/595.json?max_depth=4&timeout=1'
+    '''
+    model = M.People
+
+    max_depth = 10
+    max_timeout = 5.0
+
+    @validate({
+        'target':Int(not_empty=True),
+    })
+    @expose('json', inherit=True)
+    def get_one(self, target, max_depth=None, timeout=None, **kw):
+        try:
+            source = Int().to_python(request.controller_state.routing_args.get('index'))
+            max_depth = Int(min=1, max=self.max_depth).to_python(max_depth) or M.friendpath.MAX_DEPTH
+            timeout = min(Number(min=0).to_python(timeout) or M.friendpath.TIMEOUT, self.max_timeout)
+        except Invalid as ve:
+            abort(400, '{}'.format(ve), passthrough="json")
+
+        people = dict((p['index'], p) for p in M.People.raw.find(
+            {'index': {'$in': [source, target]}}, ['index', 'name']))
+        if source not in people or target not in people:
+            abort(404, passthrough="json")
+        try:
+            path = M.shortest_path(M.People, source, target, max_depth=max_depth, timeout=timeout)
+        except M.PathTimeout as e:
+            abort(504, '{}'.format(e), passthrough="json")
+
+        log.debug('path {} -> {}: {}'.format(source, target, path))
+        if path is not None:
+            people.update((p['index'], p) for p in M.People.raw.find(
+                {'index': {'$in': path}}, ['index', 'name']))
+        return {'model':'Path', 'value': dict(
+            source=source, target=target, length=len(path) - 1 if path else None,
+            path=[people.get(i, dict(index=i, name=None)) for i in path] if path else None)}
+
+
+class FollowersAPIController(ParanuaraCrudController):
+    '''
+    People listing a person as their friend, paged by index from the friend_ids index
+    curl 'http://localhost:8080/people/1/followers.json?after=10&limit=50&fields=name,age'
+    '''
+    model = M.People
 
+    page_size = 100
+    max_page_size = 1000
 
-class PeopleAPIController(EasyCrudRestController):
+    @expose('json', inherit=True)
+    def get_all(self, after=None, limit=None, **kw):
+        fields = requested_fields(M.People, kw) or ['name', 'age', 'index', 'eyeColor', 'has_died', 'company_id']
+        try:
+            index = Int().to_python(request.controller_state.routing_args.get('index'))
+            after = Int().to_python(after)
+            limit = min(Int(min=1).to_python(limit) or self.page_size, self.max_page_size)
+        except Invalid as ve:
+            abort(400, '{}'.format(ve), passthrough="json")
+        # disables the offset paging of the inherited optional_paginate
+        request.paginators['value_list'].paginate_items_per_page = -1
+        if M.People.raw.get(fields=['index'], index=index) is None:
+            abort(404, passthrough="json")
+
+        # documents written before friend_ids are matched on friends.index
+        # until gearbox paranuara-migrate friend-ids ran
+        spec = {'$or': [{'friend_ids': index}, {'friend_ids': {'$exists': False}, 'friends.index': index}]}
+        if after is not None:
+            spec['index'] = {'$gt': after}
+        page_fields = fields if 'index' in fields else fields + ['index']
+        # one extra row tells whether there is a next page
+        followers = list(M.People.raw.find(spec, page_fields, sort=[('index', 1)], limit=limit + 1))
+        next_after = None
+        if len(followers) > limit:
+            followers = followers[:limit]
+            next_after = followers[-1]['index']
+        serialize = M.People.raw.serializer(fields)
+        return render_json({'model':'Followers', 'value': dict(
+            index=index, followers=[serialize(f) for f in followers], next=next_after)})
+
+
+class PeopleAPIController(ParanuaraCrudController):
     """
     People resource use index to get item
     """
     model = M.People
 
+    page_size = 100
+    max_page_size = 1000
+
     common_friends = CommonFriendsAPIController(M.DBSession)
     foods = PeopleFoodsAPIController(M.DBSession)
+    suggestions = SuggestionsAPIController(M.DBSession)
+    path = PathAPIController(M.DBSession)
+    followers = FollowersAPIController(M.DBSession)
 
     @validate({
         'index':Int(not_empty=True)
@@ -141,12 +421,46 @@ class PeopleAPIController(EasyCrudRestController):
     def get_one(self, index, *args, **kw):
         """
         override get_one in order to use index instead of _id
+        fields=name,age only returns those fields
         """
-        person = M.People.query.get(index=index)
+        fields = requested_fields(M.People, kw)
+        cached = not_modified(M.People, index, fields)
+        if cached is not None:
+            return cached
+
+        snapshot = from_snapshot(M.People, fields)
+        if snapshot is not None:
+            person = snapshot.get(index, fields + ['_id', '_rev'])
+        else:
+            # plain dict straight from pymongo, no ODM object to build and dictify
+            person = M.People.raw.get(fields=fields and fields + ['_id', '_rev'], index=index)
         log.debug('person {}'.format(person))
-        if(person):
-            kw['_id'] = person._id
-        return super(PeopleAPIController, self).get_one(*args, **kw)
+        if person is None:
+            response.status_code = 404
+            return dict(model='People', value=None)
+        response.etag = M.revision_etag(person['_id'], person.get('_rev'), fields)
+        return render_json(dict(model='People', value=M.People.raw.serializer(fields)(person)))
+
+    @expose('json', inherit=True)
+    def get_all(self, *args, **kw):
+        """
+        people ordered by index, pass the returned ``next`` as ``after`` to get the following page
+        curl 'http://localhost:8080/people.json?after=100&limit=50&total=1'
+
+        stream=1 streams every person as NDJSON ordered by index instead of a page
+        """
+        if stream_requested(kw):
+            fields = requested_fields(M.People, kw)
+            return ndjson_response(M.People.raw.find(fields=fields, sort=[('index', 1)]),
+                                   M.People.raw.serializer(fields))
+        return keyset_page(M.People, kw, self.page_size, self.max_page_size)
+
+    @expose('json')
+    def bulk(self, *args, **kw):
+        '''
+        curl -X POST -H "Content-Type: application/json" http://localhost:8080/people/bulk.json -d '[{"index": 1, ...}, ...]'
+        '''
+        return bulk_post(M.People)
 
     @expose('json')
     def post(self, *args, **kw):
@@ -166,43 +480,85 @@ class PeopleAPIController(EasyCrudRestController):
 
 
 
-class EmployeesAPIController(EasyCrudRestController):
+class EmployeesAPIController(ParanuaraCrudController):
     model = M.People
 
+    page_size = 100
+    max_page_size = 1000
+
     @expose('json', inherit=True)
-    def get_all(self):
+    def get_all(self, after=None, limit=None, **kw):
         '''
-        company employees and selected employee details
+        company employees and selected employee details, every employee
+        unless ``after`` or ``limit`` is given
+
+        paged by employee index, pass the returned ``next`` as ``after`` to get the following page
+        curl 'http://localhost:8080/companies/58/employees.json?after=10&limit=50'
+
+        stream=1 streams every employee as NDJSON instead of a page
+        curl 'http://localhost:8080/companies/58/employees.json?stream=1'
+
+        fields=name,age selects other employee details than the default ones
+        curl 'http://localhost:8080/companies/58/employees.json?fields=name,age'
         '''
         errors = []
+        fields = requested_fields(M.People, kw) or M.EMPLOYEE_FIELDS
         try:
+            stream = stream_requested(kw)
             company_id = Int().to_python(request.controller_state.routing_args.get('company_id'))
-            company =  M.Company.query.get(index=company_id)
+            after = Int().to_python(after)
+            limit = Int(min=1).to_python(limit)
+            company = M.Company.raw.get(index=company_id)
             log.debug('company {}  {} {}'.format(company_id, type(company_id), company))
         except Invalid as ve:
             errors.append({'Invalid':str(ve)})
         else:
-            try:
-                employees = []
-                if company:
-                    employees = [
-                        dict([ (k, i[k]) for k in [
-                            'name', 
-                            'age', 
-                            'address', 
-                            'phone', 
-                            'index', 
-                            'email', 
-                            'company_id']]) for i in company.employees]
-            except KeyError as e:
-                errors.append({'KeyError': str(e)})
+            if stream:
+                return ndjson_response(M.iter_employees(company_id, after=after, limit=limit, fields=fields) if company else [],
+                                       M.People.raw.serializer(fields))
+
+            # clients predating the paging get every employee as before
+            paged = after is not None or limit is not None
+            if paged:
+                limit = min(limit or self.page_size, self.max_page_size)
+            employees = []
+            next_after = None
+            if company:
+                # one extra row tells whether there is a next page
+                fetch = limit + 1 if paged else None
+                page_fields = fields if 'index' in fields else fields + ['index']
+                snapshot = from_snapshot(M.People, page_fields)
+                if snapshot is not None:
+                    employees = snapshot.employees(company_id, after=after, limit=fetch, fields=page_fields)
+                else:
+                    employees = list(M.iter_employees(company_id, after=after, limit=fetch, fields=page_fields))
+                if paged and len(employees) > limit:
+                    employees = employees[:limit]
+                    next_after = employees[-1]['index']
+                serialize = M.People.raw.serializer(fields)
+                employees = [serialize(e) for e in employees]
 
         if not errors:
-            return {'model':'Employees', 'value': dict(company=company, employees=employees)}
+            return render_json({'model':'Employees', 'value': dict(
+                company=M.Company.raw.serializer()(company) if company else None, employees=employees, next=next_after)})
         else:
             return dict(errors=errors)
 
     
+    @expose('json')
+    def bulk(self, *args, **kw):
+        '''
+        bulk add employees, company_id in each document is overridden by the company index
+        curl -X POST -H "Content-Type: application/json" http://localhost:8080/companies/58/employees/bulk.json -d '[{"index": 10001, ...}, ...]'
+        '''
+        try:
+            company_id = Int(not_empty=True).to_python(request.controller_state.routing_args.get('company_id'))
+        except Invalid as ve:
+            abort(400, '{}'.format(ve), passthrough="json")
+        if M.Company.raw.get(fields=['index'], index=company_id) is None:
+            abort(404, passthrough="json")
+        return bulk_post(M.People, company_id=company_id)
+
     @expose('json')
     def post(self, *args, **kw):
         '''
@@ -225,15 +581,47 @@ class EmployeesAPIController(EasyCrudRestController):
 
         return res
 
-class CompanyAPIController(EasyCrudRestController):
+class CompanyFoodsAPIController(ParanuaraCrudController):
+    '''
+    Resource to count how many alive employees like each fruit and vegetable
+    curl 'http://localhost:8080/companies/58/foods.json'
+    For every company
+    curl 'http://localhost:8080/companies/foods.json'
+    '''
+    model = M.People
+
+    @expose('json', inherit=True)
+    def get_all(self, **kw):
+        company_id = request.controller_state.routing_args.get('company_id')
+        if company_id is None:
+            counts = M.employee_food_counts()
+            companies = [dict(company_id=k, **v) for k, v in sorted(
+                counts.items(), key=lambda item: (item[0] is None, item[0]))]
+            return {'model':'CompanyFoods', 'value': dict(companies=companies)}
+
+        try:
+            company_id = Int().to_python(company_id)
+        except Invalid as ve:
+            abort(400, '{}'.format(ve), passthrough="json")
+        company = M.Company.raw.dictify(M.Company.raw.get(index=company_id))
+        log.debug('company foods {} {}'.format(company_id, company))
+        counts = M.employee_food_counts(company_id).get(company_id, dict(fruits={}, vegetables={}))
+        return {'model':'CompanyFoods', 'value': dict(company=company, **counts)}
+
+
+class CompanyAPIController(ParanuaraCrudController):
     '''
         curl 'http://localhost:8080/companies/1.json'
 
     '''
     model = M.Company
 
+    page_size = 100
+    max_page_size = 1000
+
     # sub resource employees
     employees = EmployeesAPIController(M.DBSession)
+    foods = CompanyFoodsAPIController(M.DBSession)
 
     @validate({
         'company_id':Int(not_empty=True)
@@ -246,11 +634,39 @@ class CompanyAPIController(EasyCrudRestController):
         """
         log.debug('company_id {} {}'.format(company_id, type(company_id)))
 
-        company = M.Company.query.get(index=company_id)
+        fields = requested_fields(M.Company, kw)
+        cached = not_modified(M.Company, company_id, fields)
+        if cached is not None:
+            return cached
+
+        company = M.Company.raw.get(fields=fields and fields + ['_id', '_rev'], index=company_id)
         log.debug('company {}'.format(company))
-        if(company):
-            kw['_id'] = company._id
-        return super(CompanyAPIController, self).get_one(*args, **kw)
+        if company is None:
+            response.status_code = 404
+            return dict(model='Company', value=None)
+        response.etag = M.revision_etag(company['_id'], company.get('_rev'), fields)
+        return render_json(dict(model='Company', value=M.Company.raw.serializer(fields)(company)))
+
+    @expose('json', inherit=True)
+    def get_all(self, *args, **kw):
+        """
+        companies ordered by index, pass the returned ``next`` as ``after`` to get the following page
+        curl 'http://localhost:8080/companies.json?after=100&limit=50&total=1'
+
+        stream=1 streams every company as NDJSON ordered by index instead of a page
+        """
+        if stream_requested(kw):
+            fields = requested_fields(M.Company, kw)
+            return ndjson_response(M.Company.raw.find(fields=fields, sort=[('index', 1)]),
+                                   M.Company.raw.serializer(fields))
+        return keyset_page(M.Company, kw, self.page_size, self.max_page_size)
+
+    @expose('json')
+    def bulk(self, *args, **kw):
+        '''
+        curl -X POST -H "Content-Type: application/json" http://localhost:8080/companies/bulk.json -d '[{"index": 1, "company": "PERMADYNE"}, ...]'
+        '''
+        return bulk_post(M.Company)
 
     @expose('json')
     def post(self, *args, **kw):
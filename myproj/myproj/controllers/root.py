@@ -10,16 +10,28 @@ from myproj import model
 from myproj.controllers.secure import SecureController
 from myproj.controllers.paranuara import PeopleAPIController, CompanyAPIController
 
-from tgext.admin.mongo import BootstrapTGMongoAdminConfig as TGAdminConfig
-from tgext.admin.controller import AdminController
+from tg import config
+from tg.support.converters import asbool
 
-from myproj.lib.base import BaseController
+from myproj.lib.base import BaseController, LazyController
 from myproj.controllers.error import ErrorController
 
 
 __all__ = ['RootController']
 
 
+def make_admin_controller():
+    """
+    tgext.admin on /admin, imported on the first request reaching it,
+    None when turned off with admin.enabled = false
+    """
+    if not asbool(config.get('admin.enabled', True)):
+        return None
+    from tgext.admin.mongo import BootstrapTGMongoAdminConfig as TGAdminConfig
+    from tgext.admin.controller import AdminController
+    return AdminController(model, None, config_type=TGAdminConfig)
+
+
 class RootController(BaseController):
     """
     The root controller for the myproj application.
@@ -35,7 +47,7 @@ class RootController(BaseController):
 
     """
     secc = SecureController()
-    admin = AdminController(model, None, config_type=TGAdminConfig)
+    admin = LazyController(make_admin_controller)
     people = PeopleAPIController(model.DBSession)
     companies = CompanyAPIController(model.DBSession)
     
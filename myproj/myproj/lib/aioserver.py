@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio HTTP server for the myproj WSGI application.
+
+Connections are handled on the event loop, the WSGI application itself
+(controllers, Ming and pymongo calls, app_iter consumption) runs on
+bounded thread pools so blocking queries never stall the loop:
+
+* ``read``: GET/HEAD on the read only ``/people`` and ``/companies`` routes
+* ``slow``: the read routes matching ``slow_routes`` (common_friends,
+  suggestions and path), so a few expensive requests can't occupy every
+  ``read`` thread
+* ``default``: everything else, writes included
+
+Request bodies, with a Content-Length or chunked, are read in full before
+the application is called and answered 413 above ``max_body_size`` bytes.
+``Expect: 100-continue`` is answered before reading the body. Connections
+are closed once idle for ``keep_alive_timeout`` seconds, or answered 408
+when a request stalls that long.
+
+Enable it in the ini file with::
+
+    [server:main]
+    use = egg:myproj#asyncio
+    host = 127.0.0.1
+    port = 8080
+    threads = 8
+    slow_threads = 2
+    default_threads = 4
+    max_body_size = 16777216
+    keep_alive_timeout = 15
+
+"""
+import asyncio
+import io
+import logging
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+log = logging.getLogger(__name__)
+
+__all__ = ['AsyncioWSGIServer', 'server_runner']
+
+READ_METHODS = ('GET', 'HEAD')
+READ_ROUTES = ('/people', '/companies')
+SLOW_ROUTES = r'/(common_friends|suggestions|path)\b'
+MAX_HEADERS = 100
+MAX_BODY_SIZE = 16 * 1024 * 1024
+BODY_READ_SIZE = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+
+
+class BadRequest(ValueError):
+    status = '400 Bad Request'
+
+
+class RequestTooLarge(BadRequest):
+    status = '413 Request Entity Too Large'
+
+
+class RequestTimeout(BadRequest):
+    status = '408 Request Timeout'
+
+
+class AsyncioWSGIServer(object):
+    '''
+    Minimal HTTP/1.1 server dispatching WSGI calls to thread pools,
+    see the module documentation
+    '''
+
+    def __init__(self, app, host='127.0.0.1', port=8080, threads=8, slow_threads=2,
+                 default_threads=4, read_routes=READ_ROUTES, slow_routes=SLOW_ROUTES,
+                 max_body_size=MAX_BODY_SIZE, keep_alive_timeout=KEEP_ALIVE_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = int(port)
+        self.read_routes = tuple(read_routes)
+        self.slow_routes = re.compile(slow_routes)
+        self.max_body_size = int(max_body_size)
+        self.keep_alive_timeout = float(keep_alive_timeout)
+        self.pools = dict(
+            (name, ThreadPoolExecutor(int(size), thread_name_prefix='aioserver-' + name))
+            for name, size in [('read', threads), ('slow', slow_threads), ('default', default_threads)])
+        self.loop = None
+
+    def pool_for(self, method, path):
+        if method not in READ_METHODS:
+            return 'default'
+        if not any(path == route or path.startswith(route + '/') or path.startswith(route + '.')
+                   for route in self.read_routes):
+            return 'default'
+        if self.slow_routes.search(path):
+            return 'slow'
+        return 'read'
+
+    def environ(self, method, target, version, headers, body, peer):
+        path, _, query = target.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            # PEP 3333 native strings carry the raw bytes as latin-1
+            'PATH_INFO': unquote(path, encoding='latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': str(self.port),
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': peer[0] if peer else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers:
+            key = name.upper().replace('-', '_')
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[key] = value
+            else:
+                key = 'HTTP_' + key
+                environ[key] = environ[key] + ',' + value if key in environ else value
+        return environ
+
+    async def _write(self, writer, data):
+        writer.write(data)
+        await writer.drain()
+
+    def _call_app(self, environ, writer, keep_alive):
+        '''
+        Run the application and send its response, called on a pool thread.
+        Returns whether the connection can be kept open.
+        '''
+        state = dict(status=None, headers=None, sent=False)
+        chunked = [False]
+
+        def send(data):
+            asyncio.run_coroutine_threadsafe(self._write(writer, data), self.loop).result()
+
+        def send_headers():
+            headers = state['headers']
+            names = set(name.lower() for name, _ in headers)
+            if 'content-length' not in names:
+                if environ['SERVER_PROTOCOL'] == 'HTTP/1.1':
+                    headers.append(('Transfer-Encoding', 'chunked'))
+                    chunked[0] = True
+                else:
+                    state['keep_alive'] = False
+            if not state.get('keep_alive', keep_alive):
+                headers.append(('Connection', 'close'))
+            lines = ['{} {}'.format(environ['SERVER_PROTOCOL'], state['status'])]
+            lines.extend('{}: {}'.format(name, value) for name, value in headers)
+            send(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            state['sent'] = True
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info:
+                try:
+                    if state['sent']:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None
+            state['status'], state['headers'] = status, list(headers)
+            return write
+
+        def write(data):
+            if not state['sent']:
+                send_headers()
+            if data and environ['REQUEST_METHOD'] != 'HEAD':
+                send(b'%x\r\n%s\r\n' % (len(data), data) if chunked[0] else data)
+
+        try:
+            result = self.app(environ, start_response)
+            try:
+                for data in result:
+                    if data:
+                        write(data)
+                if not state['sent']:
+                    send_headers()
+                if chunked[0] and environ['REQUEST_METHOD'] != 'HEAD':
+                    send(b'0\r\n\r\n')
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        except Exception:
+            if state['sent']:
+                raise
+            log.exception('Error calling the application')
+            send(b'HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            return False
+        return state.get('keep_alive', keep_alive)
+
+    async def _read(self, read):
+        try:
+            return await asyncio.wait_for(read, self.keep_alive_timeout)
+        except asyncio.TimeoutError:
+            raise RequestTimeout('Nothing received in {}s'.format(self.keep_alive_timeout))
+
+    async def _read_request(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.keep_alive_timeout)
+        except asyncio.TimeoutError:
+            # idle keep-alive connection
+            return None
+        if not line:
+            return None
+        method, target, version = line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        headers = []
+        while True:
+            line = await self._read(reader.readline())
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError('Too many headers')
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.append((name.strip(), value.strip()))
+        encodings = [value.lower() for name, value in headers if name.lower() == 'transfer-encoding']
+        lengths = [value for name, value in headers if name.lower() == 'content-length']
+        if encodings and encodings != ['chunked']:
+            raise BadRequest('Unsupported transfer encoding {}'.format(encodings))
+        length = int(lengths[0]) if lengths and not encodings else 0
+        if length > self.max_body_size:
+            raise RequestTooLarge('{} bytes body'.format(length))
+        if (encodings or length) and version == 'HTTP/1.1' and any(
+                name.lower() == 'expect' and value.lower() == '100-continue' for name, value in headers):
+            # the client waits for it before sending the body
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            await writer.drain()
+        if encodings:
+            body = await self._read_chunked(reader)
+            # the application reads the decoded body
+            headers = [(name, value) for name, value in headers
+                       if name.lower() not in ('transfer-encoding', 'content-length')]
+            headers.append(('Content-Length', str(len(body))))
+            return method, target, version, headers, body
+        body = bytearray()
+        while len(body) < length:
+            body += await self._read(reader.readexactly(min(length - len(body), BODY_READ_SIZE)))
+        return method, target, version, headers, bytes(body)
+
+    async def _read_chunked(self, reader):
+        body = bytearray()
+        while True:
+            size = int((await self._read(reader.readline())).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                break
+            if len(body) + size > self.max_body_size:
+                raise RequestTooLarge('more than {} bytes body'.format(self.max_body_size))
+            while size:
+                data = await self._read(reader.readexactly(min(size, BODY_READ_SIZE)))
+                body += data
+                size -= len(data)
+            if await self._read(reader.readline()) not in (b'\r\n', b'\n'):
+                raise BadRequest('Malformed chunk')
+        # skip the trailer
+        while await self._read(reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        return bytes(body)
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, writer)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    log.debug('bad request from {}: {}'.format(peer, e))
+                    status = getattr(e, 'status', BadRequest.status)
+                    writer.write('HTTP/1.1 {}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'.format(
+                        status).encode('latin-1'))
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                connection = ','.join(v for n, v in headers if n.lower() == 'connection').lower()
+                keep_alive = (version == 'HTTP/1.1' and 'close' not in connection) or 'keep-alive' in connection
+
+                environ = self.environ(method, target, version, headers, body, peer)
+                pool = self.pool_for(method, environ['PATH_INFO'])
+                keep_alive = await self.loop.run_in_executor(
+                    self.pools[pool], self._call_app, environ, writer, keep_alive)
+                if not keep_alive:
+                    break
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception:
+            log.exception('Error serving {}'.format(peer))
+        finally:
+            writer.close()
+
+    def start(self):
+        '''
+        Listen on a new event loop, returns the asyncio server. ``port`` 0
+        picks a free port, ``self.port`` is then the bound one.
+        '''
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, self.host, self.port))
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    def close(self, server):
+        '''
+        Stop listening, wait for the running requests and close the loop
+        '''
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+        self.loop.close()
+
+    def serve_forever(self):
+        server = self.start()
+        print('Starting asyncio server on http://{}:{}'.format(self.host, self.port))
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close(server)
+
+
+def server_runner(wsgi_app, global_conf, host='127.0.0.1', port=8080, threads=8, slow_threads=2,
+                  default_threads=4, slow_routes=SLOW_ROUTES, max_body_size=MAX_BODY_SIZE,
+                  keep_alive_timeout=KEEP_ALIVE_TIMEOUT):
+    '''
+    PasteDeploy ``paste.server_runner``, ``use = egg:myproj#asyncio``
+    '''
+    AsyncioWSGIServer(wsgi_app, host=host, port=port, threads=threads, slow_threads=slow_threads,
+                      default_threads=default_threads, slow_routes=slow_routes,
+                      max_body_size=max_body_size, keep_alive_timeout=keep_alive_timeout).serve_forever()
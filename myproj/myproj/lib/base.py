@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 """The base Controller API."""
 
+import threading
+
 from tg import TGController, tmpl_context
 from tg import request
 
 
-__all__ = ['BaseController']
+__all__ = ['BaseController', 'LazyController']
 
 
 class BaseController(TGController):
@@ -25,3 +27,30 @@ class BaseController(TGController):
         tmpl_context.identity = request.identity
 
         return TGController.__call__(self, environ, context)
+
+
+class LazyController(object):
+    """
+    Mounts the controller returned by ``factory`` on first access, so its
+    imports and setup cost nothing to processes never dispatching to it.
+
+    A ``factory`` returning None leaves the path unmounted (404), for
+    controllers disabled by configuration::
+
+        admin = LazyController(make_admin_controller)
+
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._built = False
+        self._controller = None
+
+    def __get__(self, instance, owner):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._controller = self.factory()
+                    self._built = True
+        return self._controller
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks of the paranuara read paths, run with ``gearbox paranuara-bench``."""
+import gc
+import itertools
+import resource
+import tracemalloc
+from timeit import default_timer
+
+from tg.util.ming import dictify
+
+__all__ = ['BENCHMARKS', 'percentile', 'measure', 'peak_memory', 'format_stats', 'raw_reads', 'endpoints',
+           'lean_api', 'serializers', 'snapshot']
+
+
+def percentile(samples, q):
+    '''
+    Nearest-rank ``q`` percentile (0-100) of the sorted ``samples``
+    '''
+    if not samples:
+        return 0.0
+    rank = int(round(q / 100.0 * (len(samples) - 1)))
+    return samples[rank]
+
+
+def measure(fn, repeat=1000, warmup=10):
+    '''
+    Call ``fn`` ``repeat`` times, returns the call latencies summary in ms
+    '''
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = default_timer()
+        fn()
+        samples.append((default_timer() - started) * 1000.0)
+    samples.sort()
+    return dict(calls=repeat, mean=sum(samples) / len(samples) if samples else 0.0,
+                p50=percentile(samples, 50), p95=percentile(samples, 95),
+                p99=percentile(samples, 99))
+
+
+def peak_memory(fn):
+    '''
+    Peak KiB allocated by Python during one call of ``fn``
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024.0
+    finally:
+        tracemalloc.stop()
+
+
+def format_stats(name, stats):
+    parts = []
+    if 'calls' in stats:
+        parts.append('{calls:>7} calls  mean {mean:8.3f}ms  p50 {p50:8.3f}ms  p95 {p95:8.3f}ms  p99 {p99:8.3f}ms'.format(
+            **stats))
+    if 'peak_kib' in stats:
+        parts.append('peak {peak_kib:9.1f}KiB'.format(**stats))
+    if 'size_kib' in stats:
+        parts.append('size {size_kib:9.1f}KiB'.format(**stats))
+    if 'rps' in stats:
+        parts.append('{rps:9.1f} req/s'.format(**stats))
+    if 'rss_kib' in stats:
+        parts.append('max rss {rss_kib:.0f}KiB'.format(**stats))
+    return '{:<36} {}'.format(name, '  '.join(parts))
+
+
+def raw_reads(repeat=1000, sample=100, **kw):
+    '''
+    Same reads through ODM hydration and through ``Model.raw``, the ODM
+    session is cleared after every call as it would be at request end
+    '''
+    from myproj import model as M
+
+    people = [p['index'] for p in M.People.raw.find(fields=['index'], sort=[('index', 1)], limit=sample)]
+    companies = [c['index'] for c in M.Company.raw.find(fields=['index'], sort=[('index', 1)], limit=sample)]
+    if not people or not companies:
+        raise ValueError('Load some people and companies first, see gearbox paranuara-import')
+    person_fields = ['name', 'age', 'address', 'phone', 'index', 'email', 'company_id']
+
+    def cycled(indexes, fn):
+        indexes = itertools.cycle(indexes)
+        return lambda: fn(next(indexes))
+
+    def odm(fn):
+        def call(index):
+            try:
+                return fn(index)
+            finally:
+                M.DBSession.clear()
+        return call
+
+    cases = [
+        ('get_one odm', cycled(people, odm(lambda i: dictify(M.People.query.get(index=i))))),
+        ('get_one raw', cycled(people, lambda i: M.People.raw.dictify(M.People.raw.get(index=i)))),
+        ('employees odm', cycled(companies, odm(lambda i: [
+            dict([(k, getattr(p, k)) for k in person_fields])
+            for p in M.Company.query.get(index=i).employees]))),
+        ('employees raw', cycled(companies, lambda i: list(M.iter_employees(i, fields=person_fields)))),
+        ('common_friends odm', cycled(people, odm(lambda i: [
+            dict([(k, getattr(p, k)) for k in person_fields])
+            for p in M.People.query.find({'index': {'$in': list(M.People.friend_graph.friends_of(i))}})]))),
+        ('common_friends raw', cycled(people, lambda i: list(M.People.raw.find(
+            {'index': {'$in': list(M.People.friend_graph.friends_of(i))}}, person_fields)))),
+    ]
+    return [(name, measure(fn, repeat=repeat)) for name, fn in cases]
+
+
+ENDPOINTS = [
+    ('person', '/people/{person}.json'),
+    ('person fields', '/people/{person}.json?fields=name,age'),
+    ('people page', '/people.json?after={person}&limit=100'),
+    ('person foods', '/people/{person}/foods.json'),
+    ('common_friends', '/people/{person}/common_friends/{other}.json'),
+    ('common_friends group', '/people/{person}/common_friends.json?with={other},{third}&has_died=false'),
+    ('common_friends stream', '/people/{person}/common_friends/{other}.json?stream=1'),
+    ('suggestions', '/people/{person}/suggestions.json'),
+    ('path', '/people/{person}/path/{other}.json'),
+    ('followers', '/people/{person}/followers.json?limit=100'),
+    ('people stream', '/people.json?stream=1'),
+    ('company', '/companies/{company}.json'),
+    ('companies page', '/companies.json?after={company}&limit=100'),
+    ('company employees', '/companies/{company}/employees.json'),
+    ('company employees stream', '/companies/{company}/employees.json?stream=1'),
+    ('company foods', '/companies/{company}/foods.json'),
+    ('companies stream', '/companies.json?stream=1'),
+]
+
+
+def _check_wipe(drop):
+    from ming import mim
+    from myproj import model as M
+
+    if not drop and not isinstance(M.People.raw.collection, mim.Collection):
+        raise ValueError('Not a mim:// datastore, pass --drop to replace its companies and people')
+
+
+def _load_dataset(size, companies, seed, **people_options):
+    '''
+    Replace the companies and people by a synthetic dataset of ``size``
+    people, returns a callable giving the URL params of the next call
+    '''
+    from myproj import model as M
+    from myproj.lib.synthetic import load_synthetic
+
+    M.Company.query.remove({})
+    M.People.query.remove({})
+    m = companies or max(1, size // 100)
+    load_synthetic(size, m, seed=seed, **people_options)
+    M.People.friend_graph.build()
+
+    rng = itertools.count()
+    def params():
+        i = next(rng)
+        # spread over the dataset, deterministic across runs
+        return dict(person=(i * 7919) % size, other=(i * 104729 + 1) % size,
+                    third=(i * 1299709 + 2) % size, company=(i * 31) % m)
+    return params
+
+
+def endpoints(app=None, repeat=1000, sizes=(1000,), companies=None, seed=0, drop=False,
+              config_file=None, **people_options):
+    '''
+    Every paranuara endpoint through WebTest, for each dataset size a
+    synthetic dataset of that many people replaces the loaded one.
+
+    Only a MIM datastore is wiped unless ``drop`` is set. Any response
+    but a 200 fails the benchmark.
+    '''
+    from webtest import TestApp
+
+    _check_wipe(drop)
+    client = TestApp(app)
+    results = []
+    for size in sizes:
+        params = _load_dataset(size, companies, seed, **people_options)
+        for name, url in ENDPOINTS:
+            # an error page is no measure of the endpoint
+            call = lambda: client.get(url.format(**params()), status=200)
+            stats = measure(call, repeat=repeat)
+            stats['peak_kib'] = peak_memory(call)
+            results.append(('{} n={}'.format(name, size), stats))
+        # ru_maxrss is KiB on Linux
+        results.append(('process n={}'.format(size), dict(
+            rss_kib=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)))
+    return results
+
+
+def _lean_api_stack(config_file, stack, size, companies, seed, drop, repeat, people_options):
+    # runs in a fresh interpreter, the TG2 configuration of the first
+    # application loaded in a process leaks into the next one
+    import os
+    from paste.deploy import loadapp
+    from webtest import TestApp
+
+    client = TestApp(loadapp('config:{}#{}'.format(config_file, stack), relative_to=os.getcwd()))
+    _check_wipe(drop)
+    params = _load_dataset(size, companies, seed, **people_options)
+    results = []
+    total_calls, total_ms = 0, 0.0
+    for name, url in ENDPOINTS:
+        # an error page is no measure of the endpoint
+        stats = measure(lambda: client.get(url.format(**params()), status=200), repeat=repeat)
+        stats['rps'] = 1000.0 / stats['mean'] if stats['mean'] else 0.0
+        total_calls += stats['calls']
+        total_ms += stats['mean'] * stats['calls']
+        results.append(('{} {} n={}'.format(name, stack, size), stats))
+    results.append(('all endpoints {} n={}'.format(stack, size), dict(
+        rps=1000.0 * total_calls / total_ms if total_ms else 0.0)))
+    return results
+
+
+def lean_api(app=None, repeat=1000, sizes=(1000,), companies=None, seed=0, drop=False,
+             config_file='development.ini', **people_options):
+    '''
+    Requests per second of every paranuara endpoint through the full TG2
+    stack (the ``main`` application of ``config_file``) and through the
+    lean JSON API (its ``api`` application).
+
+    Each application is loaded and measured in a subprocess of its own
+    on the same synthetic dataset, so neither warms the other's caches.
+    Any response but a 200 fails the benchmark.
+    '''
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for size in sizes:
+        for stack in ['main', 'api']:
+            pool = context.Pool(1)
+            try:
+                results.extend(pool.apply(_lean_api_stack, (
+                    config_file, stack, size, companies, seed, drop, repeat, people_options)))
+            finally:
+                pool.close()
+                pool.join()
+    return results
+
+
+def serializers(app=None, repeat=1000, sizes=(1000,), companies=None, seed=0, drop=False,
+                config_file=None, **people_options):
+    '''
+    Encoding of the employees and common_friends payloads: dictify or a
+    plain projection encoded by the TG json renderer, against the compiled
+    RawQuery.serializer encoded by myproj.lib.jsonencode. The documents
+    are read once, only the encoding is timed.
+    '''
+    from tg.jsonify import encode
+    from myproj import model as M
+    from myproj.lib.jsonencode import BACKEND, dumps
+
+    _check_wipe(drop)
+    results = []
+    for size in sizes:
+        params = _load_dataset(size, companies, seed, **people_options)
+        person_fields = M.EMPLOYEE_FIELDS
+        payloads = []
+        for _ in range(100):
+            p = params()
+            company = M.Company.raw.get(index=p['company'])
+            employees = list(M.iter_employees(p['company'], fields=person_fields))
+            common = list(M.People.raw.find(
+                {'index': {'$in': list(M.People.friend_graph.common_friends(p['person'], p['other']))}}))
+            payloads.append((company, employees, common))
+        cycled = itertools.cycle(payloads)
+
+        def employees_tg():
+            company, employees, _ = next(cycled)
+            return encode(dict(company=M.Company.raw.dictify(company), employees=[
+                dict([(k, e.get(k)) for k in person_fields]) for e in employees]))
+
+        def employees_compiled():
+            company, employees, _ = next(cycled)
+            serialize = M.People.raw.serializer(person_fields)
+            return dumps(dict(company=M.Company.raw.serializer()(company),
+                              employees=[serialize(e) for e in employees]))
+
+        def common_friends_tg():
+            return encode(dict(common_friends=[M.People.raw.dictify(p) for p in next(cycled)[2]]))
+
+        def common_friends_compiled():
+            serialize = M.People.raw.serializer()
+            return dumps(dict(common_friends=[serialize(p) for p in next(cycled)[2]]))
+
+        for name, fn in [('employees tg', employees_tg), ('employees ' + BACKEND, employees_compiled),
+                         ('common_friends tg', common_friends_tg),
+                         ('common_friends ' + BACKEND, common_friends_compiled)]:
+            stats = measure(fn, repeat=repeat)
+            stats['peak_kib'] = peak_memory(fn)
+            results.append(('{} n={}'.format(name, size), stats))
+    return results
+
+
+def snapshot(app=None, repeat=1000, sizes=(1000,), companies=None, seed=0, drop=False,
+             config_file=None, **people_options):
+    '''
+    People.snapshot against the database: build and refresh time, person
+    and employees lookups, and the snapshot size next to the peak memory
+    of the same fields held as one dict per person.
+    '''
+    from myproj import model as M
+    from myproj.model.snapshot import SNAPSHOT_FIELDS
+
+    _check_wipe(drop)
+    results = []
+    people = M.People.snapshot
+    for size in sizes:
+        params = _load_dataset(size, companies, seed, **people_options)
+        fields = M.EMPLOYEE_FIELDS
+        results.append(('build n={}'.format(size), measure(people.build, repeat=1, warmup=0)))
+        results.append(('refresh n={}'.format(size), measure(people.refresh, repeat=10, warmup=0)))
+        cases = [
+            ('person db', lambda: M.People.raw.get(fields=fields, index=params()['person'])),
+            ('person snapshot', lambda: people.get(params()['person'], fields)),
+            ('employees db', lambda: list(M.iter_employees(params()['company'], fields=fields))),
+            ('employees snapshot', lambda: people.employees(params()['company'], fields=fields)),
+        ]
+        for name, fn in cases:
+            results.append(('{} n={}'.format(name, size), measure(fn, repeat=repeat)))
+        results.append(('snapshot n={}'.format(size), dict(size_kib=people.memory_usage()['total'] / 1024.0)))
+        results.append(('dicts n={}'.format(size), dict(
+            peak_kib=peak_memory(lambda: list(M.People.raw.find({}, SNAPSHOT_FIELDS)))),))
+    return results
+
+
+BENCHMARKS = {
+    'raw-reads': raw_reads,
+    'endpoints': endpoints,
+    'lean-api': lean_api,
+    'serializers': serializers,
+    'snapshot': snapshot,
+}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Import time profile of myproj modules, from ``python -X importtime``."""
+import subprocess
+import sys
+from collections import namedtuple
+
+__all__ = ['ImportTime', 'import_profile', 'format_import_report']
+
+#: one ``-X importtime`` line, times in microseconds
+ImportTime = namedtuple('ImportTime', ['name', 'self_us', 'cumulative_us', 'depth'])
+
+
+def _parse(lines):
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        columns = line[len('import time:'):].split('|')
+        if len(columns) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(columns[0]), int(columns[1])
+        except ValueError:
+            # the header line
+            continue
+        name = columns[2].rstrip()
+        stripped = name.lstrip()
+        # nesting is shown by two spaces per level after the first one
+        yield ImportTime(stripped, self_us, cumulative_us, (len(name) - len(stripped) - 1) // 2)
+
+
+def import_profile(*modules):
+    '''
+    ImportTime of every module imported by a fresh interpreter importing
+    ``modules``, in import completion order. Needs python 3.7 or later.
+    '''
+    command = [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(', '.join(modules))]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    _, stderr = process.communicate()
+    if process.returncode:
+        errors = [line for line in stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('{} failed:\n{}'.format(' '.join(command), '\n'.join(errors)))
+    return list(_parse(stderr.splitlines()))
+
+
+def format_import_report(profile, top=20):
+    '''
+    Total import time and the ``top`` slowest top level imports, as text
+    '''
+    roots = [entry for entry in profile if entry.depth == 0]
+    total = sum(entry.cumulative_us for entry in roots)
+    lines = ['{} modules imported in {:.1f}ms'.format(len(profile), total / 1000.0)]
+    for entry in sorted(roots, key=lambda e: e.cumulative_us, reverse=True)[:top]:
+        lines.append('{:>10.1f}ms {:>10.1f}ms self  {}'.format(
+            entry.cumulative_us / 1000.0, entry.self_us / 1000.0, entry.name))
+    return '\n'.join(lines)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""JSON encoding of plain payloads, with the fastest installed backend."""
+import json
+
+from tg import response
+
+__all__ = ['BACKEND', 'dumps', 'json_response']
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _orjson_dumps(obj):
+    # int keys like the employee food counts are text in JSON
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _json_dumps(obj):
+    return _encoder.encode(obj).encode('utf-8')
+
+
+if orjson is not None:
+    BACKEND, _dumps = 'orjson', _orjson_dumps
+elif ujson is not None:
+    BACKEND, _dumps = 'ujson', _ujson_dumps
+else:
+    BACKEND, _dumps = 'json', _json_dumps
+
+
+def dumps(obj):
+    '''
+    UTF-8 JSON bytes of ``obj``, which must only hold JSON types, see
+    myproj.model.serializers. Encoded with BACKEND: orjson or ujson when
+    installed, the json module otherwise.
+    '''
+    return _dumps(obj)
+
+
+def json_response(payload):
+    '''
+    Body of a JSON response encoded by ``dumps`` instead of the TG json
+    renderer, return it from a json exposed method
+    '''
+    response.content_type = 'application/json'
+    response.charset = 'utf-8'
+    return dumps(payload)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Incremental reader for files holding one large JSON array."""
+import codecs
+import json
+
+__all__ = ['CHUNK_SIZE', 'iter_json_array']
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(fileobj, chunk_size=CHUNK_SIZE):
+    '''
+    Yield the items of the top level JSON array in ``fileobj`` one at a
+    time, reading ``chunk_size`` characters at a time instead of loading
+    the whole document.
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def fill(buf, pos):
+        chunk = fileobj.read(chunk_size)
+        done = not chunk
+        if isinstance(chunk, bytes):
+            chunk = utf8.decode(chunk, final=done)
+        return buf[pos:] + chunk, 0, done
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError('Unexpected end of JSON array')
+            buf, pos, eof = fill(buf, pos)
+            continue
+
+        char = buf[pos]
+        if not started:
+            if char != '[':
+                raise ValueError('Expected a JSON array, got {!r}'.format(char))
+            started = True
+            pos += 1
+        elif char == ']':
+            return
+        elif char == ',':
+            pos += 1
+        else:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                buf, pos, eof = fill(buf, pos)
+                continue
+            after = end
+            while after < len(buf) and buf[after] in _WHITESPACE:
+                after += 1
+            if after == len(buf) or buf[after] not in ',]':
+                if eof:
+                    raise ValueError('Expected , or ] at char {}'.format(after))
+                # a number cut at the chunk boundary still decodes, read on to be sure
+                buf, pos, eof = fill(buf, pos)
+                continue
+            yield item
+            pos = end
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Per request database query accounting."""
+import logging
+
+from myproj.model.session import start_query_stats, stop_query_stats
+
+log = logging.getLogger(__name__)
+
+__all__ = ['QueryStatsMiddleware', 'QUERIES_HEADER', 'DOCUMENTS_HEADER', 'DB_TIME_HEADER']
+
+QUERIES_HEADER = 'X-DB-Queries'
+DOCUMENTS_HEADER = 'X-DB-Documents'
+DB_TIME_HEADER = 'X-DB-Time'
+
+
+class _ClosingIterator(object):
+
+    def __init__(self, result, on_close):
+        self.result = result
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def close(self):
+        try:
+            if hasattr(self.result, 'close'):
+                self.result.close()
+        finally:
+            self.on_close()
+
+
+class QueryStatsMiddleware(object):
+    '''
+    Accounts the queries, documents returned and database time of every
+    request, see myproj.model.session.
+
+    The totals up to the response start are sent in the X-DB-* headers,
+    the final ones, including streamed bodies, are logged when the
+    response is closed along with the query shapes repeated often enough
+    to be an N+1 pattern.
+    '''
+
+    def __init__(self, app, headers=True):
+        self.app = app
+        self.headers = headers
+
+    def __call__(self, environ, start_response):
+        stats = start_query_stats()
+
+        def stats_start_response(status, headers, exc_info=None):
+            if self.headers:
+                headers = list(headers) + [
+                    (QUERIES_HEADER, str(stats.queries)),
+                    (DOCUMENTS_HEADER, str(stats.documents)),
+                    (DB_TIME_HEADER, '{:.1f}ms'.format(stats.db_time * 1000.0))]
+            return start_response(status, headers, exc_info)
+
+        def done():
+            stop_query_stats()
+            request = '{} {}'.format(environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'))
+            log.info('{} {}'.format(request, stats))
+            for shape, count in stats.repeated():
+                log.warning('{} possible N+1: {} queries on {} by {}'.format(
+                    request, count, shape[0], ', '.join(shape[1]) or 'nothing'))
+
+        try:
+            result = self.app(environ, stats_start_response)
+        except Exception:
+            done()
+            raise
+        return _ClosingIterator(result, done)
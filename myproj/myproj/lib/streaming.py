@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Streaming NDJSON responses for list endpoints."""
+import logging
+
+from formencode.validators import Bool
+from tg import response
+
+from myproj.lib.jsonencode import dumps
+from myproj.model.serializers import plain
+
+log = logging.getLogger(__name__)
+
+__all__ = ['STREAM_BATCH_SIZE', 'NDJSON_CONTENT_TYPE', 'stream_requested', 'ndjson_response']
+
+STREAM_BATCH_SIZE = 500
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def stream_requested(kw):
+    '''
+    Pop the ``stream`` flag from the request params
+    '''
+    return bool(Bool().to_python(kw.pop('stream', None)))
+
+
+def _iter_ndjson(rows, batch_size, serialize):
+    lines = []
+    for row in rows:
+        lines.append(dumps(serialize(row)))
+        if len(lines) >= batch_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def ndjson_response(rows, serialize=plain, batch_size=STREAM_BATCH_SIZE):
+    '''
+    Return an app_iter yielding one JSON document per line, ``batch_size``
+    rows per chunk. ``rows`` is consumed lazily, so pass a cursor or a
+    generator to keep memory flat. Each row goes through ``serialize``,
+    a RawQuery.serializer for model documents.
+    '''
+    if hasattr(rows, 'batch_size'):
+        rows = rows.batch_size(batch_size)
+    response.content_type = NDJSON_CONTENT_TYPE
+    response.charset = 'utf-8'
+    return _iter_ndjson(rows, batch_size, serialize)
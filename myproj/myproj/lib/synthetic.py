@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Synthetic paranuara datasets of any size, shaped like resources/people.json."""
+import random
+import uuid
+
+__all__ = ['DEGREE_DISTRIBUTIONS', 'parse_mix', 'synthetic_companies', 'synthetic_people',
+           'load_synthetic']
+
+EYE_COLORS = 'brown=5,blue=3,green=2'
+OTHER_FOODS = ['bread', 'cheese', 'chicken', 'rice']
+TAGS = ['quis', 'sunt', 'sit', 'aliquip', 'pariatur', 'nulla', 'veniam', 'duis', 'officia', 'anim']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vo', 'zu', 'net', 'bri', 'dex', 'pla', 'qua']
+
+
+def _uniform(rng, mean, maximum):
+    return rng.randint(0, min(2 * mean, maximum))
+
+
+def _powerlaw(rng, mean, maximum, alpha=2.0):
+    # pareto with minimum mean * (alpha - 1) / alpha has the requested mean,
+    # a few people get a very high degree like in real social graphs
+    scale = mean * (alpha - 1) / alpha
+    return min(int(rng.paretovariate(alpha) * scale), maximum)
+
+
+def _fixed(rng, mean, maximum):
+    return min(mean, maximum)
+
+
+#: name -> f(rng, mean_degree, max_degree) returning a friend count
+DEGREE_DISTRIBUTIONS = {
+    'uniform': _uniform,
+    'powerlaw': _powerlaw,
+    'fixed': _fixed,
+}
+
+
+def parse_mix(mix):
+    '''
+    "brown=5,blue=3" into (['brown', 'blue'], [5.0, 3.0])
+    '''
+    names, weights = [], []
+    for entry in mix.split(','):
+        name, _, weight = entry.partition('=')
+        names.append(name.strip())
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+def _word(rng, syllables=3):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def synthetic_companies(m, seed=0):
+    '''
+    Companies 0..m-1
+    '''
+    rng = random.Random(seed)
+    for index in range(m):
+        yield dict(index=index, company=_word(rng, 4).upper())
+
+
+def synthetic_people(n, m, seed=0, degree='powerlaw', mean_degree=10, max_degree=1000,
+                     eye_colors=EYE_COLORS, fruit_ratio=0.5, died_ratio=0.1):
+    '''
+    People 0..n-1 working for companies 0..m-1.
+
+    The friend count of each person is drawn from ``degree`` in
+    DEGREE_DISTRIBUTIONS, friends are uniformly random people.
+    ``eye_colors`` is a weighted mix, see parse_mix, ``fruit_ratio``
+    the share of fruits among the favourite fruits and vegetables.
+    '''
+    from myproj.model import FRUITS, VEGETABLES
+
+    rng = random.Random(seed)
+    degree_of = DEGREE_DISTRIBUTIONS[degree]
+    colors, color_weights = parse_mix(eye_colors)
+    fruits, vegetables = sorted(FRUITS), sorted(VEGETABLES)
+
+    for index in range(n):
+        foods = []
+        for _ in range(rng.randint(1, 4)):
+            roll = rng.random()
+            if roll < 0.1:
+                foods.append(rng.choice(OTHER_FOODS))
+            elif roll < 0.1 + 0.9 * fruit_ratio:
+                foods.append(rng.choice(fruits))
+            else:
+                foods.append(rng.choice(vegetables))
+        friends = rng.sample(range(n), min(degree_of(rng, mean_degree, max_degree), n))
+        first, last = _word(rng, 2).capitalize(), _word(rng, 3).capitalize()
+        yield dict(
+            index=index,
+            guid=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            has_died=rng.random() < died_ratio,
+            balance='${:,.2f}'.format(rng.uniform(1000, 4000)),
+            picture='http://placehold.it/32x32',
+            age=rng.randint(10, 90),
+            eyeColor=rng.choices(colors, color_weights)[0],
+            name='{} {}'.format(first, last),
+            gender=rng.choice(['male', 'female']),
+            company_id=rng.randrange(m) if m else None,
+            email='{}{}{}@example.com'.format(first, last, index).lower(),
+            phone='+1 ({:03d}) {:03d}-{:04d}'.format(rng.randrange(1000), rng.randrange(1000), rng.randrange(10000)),
+            address='{} {} Street, {}, {}'.format(rng.randint(1, 999), _word(rng).capitalize(),
+                                                  _word(rng).capitalize(), rng.randint(1000, 9999)),
+            about='Synthetic person {}'.format(index),
+            registered='2016-0{}-1{}T04:23:18 -10:00'.format(rng.randint(1, 9), rng.randint(0, 9)),
+            tags=rng.sample(TAGS, 5),
+            friends=[dict(index=friend) for friend in friends],
+            greeting='Hello, {} {}! You have {} unread messages.'.format(first, last, rng.randint(1, 10)),
+            favouriteFood=foods,
+        )
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_synthetic(n, m, seed=0, batch_size=1000, **people_options):
+    '''
+    Insert m synthetic companies and n people in the bound datastore,
+    returns the number of inserted (companies, people)
+    '''
+    from myproj import model
+
+    counts = []
+    for model_class, items in [(model.Company, synthetic_companies(m, seed)),
+                               (model.People, synthetic_people(n, m, seed, **people_options))]:
+        inserted = 0
+        for batch in _batches(items, batch_size):
+            inserted += len(model.bulk_insert(model_class, batch, batch_size=batch_size)[1])
+        counts.append(inserted)
+    # rebuilt compact on next use instead of the per insert overlay
+    model.People.friend_graph.reset()
+    return tuple(counts)
@@ -5,17 +5,45 @@ import ming.odm
 from .session import mainsession, DBSession
 
 
-def init_model(engine):
-    """Call me before using any of the tables or classes in the model."""
+def init_model(engine, index_sync=None):
+    """Call me before using any of the tables or classes in the model.
+
+    Indexes are only checked when their manifest changed, ``index_sync``
+    (default: the ming.index_sync option, background) tells whether to
+    build them right away, in a background thread or leave them to
+    gearbox paranuara-indexes, see myproj.model.indexes.
+
+    The paranuara.snapshot option serves people and employees reads from
+    the in-memory People.snapshot, refreshed when older than
+    paranuara.snapshot_max_age seconds, see myproj.model.snapshot.
+    People.friend_graph is rebuilt when older than
+    paranuara.friend_graph_max_age seconds.
+    """
+    from tg import config
+    from tg.support.converters import asbool
+
     mainsession.bind = engine
     ming.odm.Mapper.compile_all()
+    People.friend_graph.reset()
+    max_age = config.get('paranuara.friend_graph_max_age', 60)
+    People.friend_graph.max_age = float(max_age) if max_age not in (None, '') else None
+    People.snapshot.reset()
+    People.snapshot.enabled = asbool(config.get('paranuara.snapshot', False))
+    max_age = config.get('paranuara.snapshot_max_age', 60)
+    People.snapshot.max_age = float(max_age) if max_age not in (None, '') else None
+    auth_cache.clear()
 
-    for mapper in ming.odm.Mapper.all_mappers():
-        mainsession.ensure_indexes(mapper.collection)
+    if index_sync is None:
+        index_sync = config.get('ming.index_sync', 'background')
+    init_indexes(index_sync)
     return DBSession
 
 # Import your model modules here.
-from myproj.model.auth import User, Group, Permission
-from myproj.model.paranuara import People, Company
+from myproj.model.auth import User, Group, Permission, auth_cache
+from myproj.model.paranuara import People, Company, FRUITS, VEGETABLES, classify_foods, employee_food_counts
+from myproj.model.paranuara import revision_etag, iter_employees, EMPLOYEE_FIELDS, reconcile_headcounts
+from myproj.model.bulk import bulk_insert
+from myproj.model.friendpath import shortest_path, PathTimeout
+from myproj.model.indexes import init_indexes, sync_indexes, indexes_current
 
 __all__ = ('User', 'Group', 'Permission')
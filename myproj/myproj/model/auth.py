@@ -11,14 +11,42 @@ though.
 import os
 from datetime import datetime
 from hashlib import sha256
-__all__ = ['User', 'Group', 'Permission']
+__all__ = ['User', 'Group', 'Permission', 'auth_cache']
 
 from ming import schema as s
 from ming.odm import FieldProperty, ForeignIdProperty, RelationProperty
-from ming.odm import Mapper
+from ming.odm import Mapper, MapperExtension
 from ming.odm.declarative import MappedClass
+from repoze.lru import ExpiringLRUCache
 from myproj.model import DBSession
 
+AUTH_CACHE_SIZE = 1000
+AUTH_CACHE_TIMEOUT = 60
+
+#: Resolved user _id, group and permission names by userid, see ApplicationAuthMetadata
+auth_cache = ExpiringLRUCache(AUTH_CACHE_SIZE, default_timeout=AUTH_CACHE_TIMEOUT)
+
+
+class AuthCacheExtension(MapperExtension):
+    '''
+    Clears ``auth_cache`` whenever a user, group or permission changes.
+
+    A group or permission change affects every cached user holding it, so
+    the whole cache is dropped rather than tracking who is affected.
+    '''
+
+    def after_insert(self, instance, state, sess):
+        auth_cache.clear()
+
+    def after_update(self, instance, state, sess):
+        auth_cache.clear()
+
+    def after_delete(self, instance, state, sess):
+        auth_cache.clear()
+
+    def after_remove(self, sess, *args, **kwargs):
+        auth_cache.clear()
+
 
 class Group(MappedClass):
     """
@@ -27,6 +55,7 @@ class Group(MappedClass):
     class __mongometa__:
         session = DBSession
         name = 'tg_group'
+        extensions = [AuthCacheExtension]
         unique_indexes = [('group_name',),]
 
     _id = FieldProperty(s.ObjectId)
@@ -43,6 +72,7 @@ class Permission(MappedClass):
     class __mongometa__:
         session = DBSession
         name = 'tg_permission'
+        extensions = [AuthCacheExtension]
         unique_indexes = [('permission_name',),]
 
     _id = FieldProperty(s.ObjectId)
@@ -64,6 +94,7 @@ class User(MappedClass):
     class __mongometa__:
         session = DBSession
         name = 'tg_user'
+        extensions = [AuthCacheExtension]
         unique_indexes = [('user_name',),]
 
     class PasswordProperty(FieldProperty):
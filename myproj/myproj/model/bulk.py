@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Batched, schema validated inserts for mapped classes."""
+import logging
+
+from timeit import default_timer
+
+from ming import mim
+from ming.odm.base import state
+from ming.schema import Invalid
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from myproj.model.session import record_query
+
+log = logging.getLogger(__name__)
+
+__all__ = ['BULK_BATCH_SIZE', 'bulk_insert']
+
+BULK_BATCH_SIZE = 1000
+
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+
+def _insert_each(collection, docs):
+    '''
+    Insert ``docs`` one at a time, returns {position: result} for the ones that failed
+    '''
+    failed = {}
+    for position, doc in enumerate(docs):
+        try:
+            collection.insert_one(doc)
+        except DuplicateKeyError as duplicate:
+            failed[position] = dict(status='duplicate', error=str(duplicate))
+    return failed
+
+
+def _insert_batch(collection, docs):
+    '''
+    Unordered insert of ``docs``, returns {position: result} for the ones that failed
+    '''
+    if isinstance(collection, mim.Collection):
+        # MIM insert_many ignores ordered and raises DuplicateKeyError at the
+        # first duplicate, without telling which documents were written
+        return _insert_each(collection, docs)
+    failed = {}
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as bwe:
+        for error in bwe.details.get('writeErrors', []):
+            status = 'duplicate' if error.get('code') in DUPLICATE_KEY_CODES else 'error'
+            failed[error['index']] = dict(status=status, error=error.get('errmsg'))
+    return failed
+
+
+def bulk_insert(model, items, batch_size=BULK_BATCH_SIZE, **overrides):
+    '''
+    Validate ``items`` against the ``model`` schema and insert them in
+    unordered batches, a failing item never aborts the rest.
+
+    ``overrides`` are set on every item before validation. Documents are
+    written without going through the ODM session unit of work, the mapper
+    extensions ``before_insert``/``after_insert`` are still called with a new
+    mapped instance per item, or ``after_bulk_insert`` once with all the
+    inserted documents when defined.
+    Returns a (results, inserted) tuple: one status dict per item, in
+    order, and the mapped instances that were written.
+    '''
+    mapper = model.query.mapper
+    document = mapper.collection
+    collection = document.m.collection
+    results = [None] * len(items)
+    valid = []
+    for position, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise Invalid('Not a document', item, None)
+            obj = mapper.create(dict(item, **overrides), {})
+        except Invalid as e:
+            index = item.get('index') if isinstance(item, dict) else None
+            results[position] = dict(status='invalid', index=index, error=str(e))
+            continue
+        # a new object, nothing was loaded from mongodb
+        state(obj).original_document = None
+        valid.append((position, obj))
+
+    for _, obj in valid:
+        for extension in mapper.extensions:
+            extension.before_insert(obj, state(obj), mapper.session)
+
+    inserted = []
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        started = default_timer()
+        failed = _insert_batch(collection, [state(obj).document for _, obj in batch])
+        record_query(elapsed=default_timer() - started)
+        for offset, (position, obj) in enumerate(batch):
+            doc = state(obj).document
+            result = failed.get(offset)
+            if result is None:
+                result = dict(status='inserted', _id=doc['_id'])
+                inserted.append(obj)
+            result['index'] = doc.get('index')
+            results[position] = result
+
+    for extension in mapper.extensions:
+        # extensions able to handle a whole batch at once save a write per document
+        after_bulk_insert = getattr(extension, 'after_bulk_insert', None)
+        if after_bulk_insert is not None:
+            after_bulk_insert([state(obj).document for obj in inserted])
+            continue
+        for obj in inserted:
+            extension.after_insert(obj, state(obj), mapper.session)
+    log.debug('bulk insert into {} {} items {} inserted'.format(collection.name, len(items), len(inserted)))
+    return results, inserted
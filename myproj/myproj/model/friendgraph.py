@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""In-process friendship adjacency index built from the people collection."""
+import heapq
+import logging
+import threading
+from array import array
+from collections import defaultdict
+from timeit import default_timer
+
+from ming.odm import MapperExtension
+
+log = logging.getLogger(__name__)
+
+__all__ = ['FriendGraph', 'FriendGraphExtension', 'friend_indexes', 'intersect_sorted',
+           'intersect_many']
+
+#: overlay entries above which they are merged into the CSR arrays
+OVERLAY_MERGE_SIZE = 1000
+
+
+def friend_indexes(friends):
+    '''
+    Normalize a People.friends value ([{'index': n}, ...]) into a sorted
+    array of unique ints
+    '''
+    indexes = set()
+    for friend in friends or []:
+        if isinstance(friend, dict):
+            friend = friend.get('index')
+        if friend is not None:
+            indexes.add(int(friend))
+    return array('l', sorted(indexes))
+
+
+def intersect_sorted(left, right):
+    '''
+    Merge-intersection of two ascending int sequences
+    '''
+    result = array('l')
+    i, j = 0, 0
+    len_left, len_right = len(left), len(right)
+    while i < len_left and j < len_right:
+        a, b = left[i], right[j]
+        if a == b:
+            result.append(a)
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def intersect_many(arrays):
+    '''
+    Intersection of several ascending int sequences, smallest first so the
+    running result only shrinks
+    '''
+    arrays = sorted(arrays, key=len)
+    if not arrays:
+        return array('l')
+    result = arrays[0]
+    for other in arrays[1:]:
+        if not result:
+            break
+        result = intersect_sorted(result, other)
+    return array('l', result)
+
+
+def _spread(indexes, maximum):
+    '''
+    At most ``maximum`` of ``indexes`` evenly spaced, all of them without a maximum
+    '''
+    if not maximum or len(indexes) <= maximum:
+        return indexes
+    step = -(-len(indexes) // maximum)
+    return indexes[::step]
+
+
+class FriendGraph(object):
+    '''
+    Compact CSR-style adjacency index of People.friends
+
+    Friends of the person at row r are targets[offsets[r]:offsets[r + 1]],
+    kept sorted so common friends is a merge-intersection. Writes after the
+    initial build land in a small overlay which takes precedence over the
+    CSR arrays, it is merged into them once it holds more than
+    OVERLAY_MERGE_SIZE people. Writes before the first build are left to
+    it, processes that only write never hold a graph.
+
+    The overlay only sees the ODM writes of this process. With ``max_age``
+    (seconds) set, a lookup finding the graph built longer ago than that
+    starts a rebuild in a background thread, so the writes of other
+    workers show up, and answers from the current graph meanwhile.
+    '''
+
+    def __init__(self, model, max_age=None):
+        self.model = model
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        # serializes builds, lookups only wait for the first one
+        self._build_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Drop the index, it is lazily rebuilt on next access
+        '''
+        with self._lock:
+            self._rows = None
+            self._offsets = array('l', [0])
+            self._targets = array('l')
+            self._overlay = {}
+            # writes while a build scans the collection, None when not building
+            self._building = None
+            self._built_at = None
+
+    @property
+    def built(self):
+        return self._rows is not None
+
+    def build(self):
+        '''
+        Load every person's friends in a single projected pass, lookups go
+        on with the current arrays until the new ones replace them
+        '''
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            # writes from now on are newer than what the scan below reads
+            self._building = {}
+        rows = {}
+        offsets = array('l', [0])
+        targets = array('l')
+        for doc in self.model.raw.find({}, ['index', 'friends']):
+            rows[doc['index']] = len(offsets) - 1
+            targets.extend(friend_indexes(doc.get('friends')))
+            offsets.append(len(targets))
+        with self._lock:
+            self._rows, self._offsets, self._targets = rows, offsets, targets
+            self._overlay, self._building = self._building or {}, None
+            self._built_at = default_timer()
+            if len(self._overlay) > OVERLAY_MERGE_SIZE:
+                self._merge()
+        log.debug('friend graph built with {} people {} edges'.format(len(rows), len(targets)))
+
+    def current_rebuild(self):
+        '''
+        The running background rebuild thread, if any
+        '''
+        thread = self._thread
+        return thread if thread is not None and thread.is_alive() else None
+
+    def start_rebuild(self):
+        '''
+        Start a background rebuild unless one is already running
+        '''
+        with self._thread_lock:
+            if self.current_rebuild() is None:
+                self._thread = threading.Thread(target=self._rebuild_in_background, name='friend-graph')
+                self._thread.daemon = True
+                self._thread.start()
+            return self._thread
+
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            # try again after max_age rather than on every lookup
+            self._built_at = default_timer()
+            log.exception('friend graph rebuild failed')
+
+    def _current(self):
+        if not self.built:
+            with self._build_lock:
+                if not self.built:
+                    self._build()
+        elif self.max_age is not None and default_timer() - self._built_at > self.max_age:
+            self.start_rebuild()
+
+    def _merge(self):
+        '''
+        Fold the overlay into fresh CSR arrays, people left without
+        friends get no row as friends_of answers the same for them
+        '''
+        rows = {}
+        offsets = array('l', [0])
+        targets = array('l')
+        for index in sorted(set(self._rows) | set(self._overlay)):
+            friends = self._overlay.get(index)
+            if friends is None:
+                row = self._rows[index]
+                friends = self._targets[self._offsets[row]:self._offsets[row + 1]]
+            if friends:
+                rows[index] = len(offsets) - 1
+                targets.extend(friends)
+                offsets.append(len(targets))
+        log.debug('friend graph merged {} overlay entries'.format(len(self._overlay)))
+        self._rows, self._offsets, self._targets, self._overlay = rows, offsets, targets, {}
+
+    def _write(self, index, friends):
+        with self._lock:
+            if self._building is not None:
+                self._building[index] = friends
+            if not self.built:
+                # the first build reads it back
+                return
+            self._overlay[index] = friends
+            if len(self._overlay) > OVERLAY_MERGE_SIZE:
+                self._merge()
+
+    def update(self, index, friends):
+        self._write(index, friend_indexes(friends))
+
+    def discard(self, index):
+        self._write(index, array('l'))
+
+    def friends_of(self, index):
+        '''
+        Sorted array of the friend indexes of person ``index``
+        '''
+        self._current()
+        with self._lock:
+            friends = self._overlay.get(index)
+            if friends is not None:
+                return friends
+            row = self._rows.get(index)
+            if row is None:
+                return array('l')
+            return self._targets[self._offsets[row]:self._offsets[row + 1]]
+
+    def common_friends(self, *indexes):
+        return intersect_many([self.friends_of(index) for index in indexes])
+
+    def friends_of_friends(self, index, max_fanout=None):
+        '''
+        {candidate: mutual friends} of the second degree contacts of
+        ``index``, excluding ``index`` and its friends.
+
+        With ``max_fanout`` at most that many friends, evenly spread over
+        the friend list, are expanded and each contributes at most that
+        many of its friends, so high degree people cost a bounded time.
+        '''
+        friends = self.friends_of(index)
+        counts = defaultdict(int)
+        for friend in _spread(friends, max_fanout):
+            if friend == index:
+                continue
+            for candidate in _spread(self.friends_of(friend), max_fanout):
+                counts[candidate] += 1
+        counts.pop(index, None)
+        for friend in friends:
+            counts.pop(friend, None)
+        return counts
+
+    def suggestions(self, index, limit=10, max_fanout=None):
+        '''
+        Top ``limit`` (candidate, mutual friends) pairs, most mutual friends
+        first then lowest index, picked with a heap instead of a full sort
+        '''
+        counts = self.friends_of_friends(index, max_fanout)
+        return heapq.nlargest(limit, counts.items(), key=lambda item: (item[1], -item[0]))
+
+
+class FriendGraphExtension(MapperExtension):
+    '''
+    Keeps the model's ``friend_graph`` current on ODM writes
+    '''
+
+    def _graph(self):
+        return self.mapper.mapped_class.friend_graph
+
+    def after_insert(self, instance, state, sess):
+        self._graph().update(instance.index, instance.friends)
+
+    def after_update(self, instance, state, sess):
+        original = state.original_document or {}
+        if original.get('index') not in (None, instance.index):
+            self._graph().discard(original['index'])
+        self._graph().update(instance.index, instance.friends)
+
+    def after_delete(self, instance, state, sess):
+        self._graph().discard(instance.index)
+
+    def after_remove(self, sess, *args, **kwargs):
+        self._graph().reset()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Shortest friendship chain between two people, searched in the database."""
+import logging
+from timeit import default_timer
+
+from myproj.model.friendgraph import friend_indexes
+
+log = logging.getLogger(__name__)
+
+__all__ = ['PathTimeout', 'shortest_path', 'MAX_DEPTH', 'TIMEOUT']
+
+MAX_DEPTH = 6
+TIMEOUT = 2.0
+
+
+class PathTimeout(Exception):
+    '''
+    The search ran out of time before finding or ruling out a path
+    '''
+
+
+def _chain(parents, node):
+    chain = []
+    while node is not None:
+        chain.append(node)
+        node = parents[node]
+    return chain
+
+
+def _friends(model, indexes):
+    '''
+    (index, friend indexes) of the people ``indexes``. Documents written
+    before friend_ids, until ``gearbox paranuara-migrate friend-ids`` ran,
+    are read back for their friends.
+    '''
+    missing = []
+    for doc in model.raw.find({'index': {'$in': indexes}}, ['index', 'friend_ids']):
+        if 'friend_ids' in doc:
+            yield doc['index'], doc['friend_ids']
+        else:
+            missing.append(doc['index'])
+    if missing:
+        for doc in model.raw.find({'index': {'$in': missing}}, ['index', 'friends']):
+            yield doc['index'], friend_indexes(doc.get('friends'))
+
+
+def _listing(model, indexes):
+    '''
+    (index, friend indexes) of the people listing any of ``indexes`` as a
+    friend, from friends.index for the documents without friend_ids
+    '''
+    for doc in model.raw.find({'friend_ids': {'$in': indexes}}, ['index', 'friend_ids']):
+        yield doc['index'], doc['friend_ids']
+    for doc in model.raw.find({'friend_ids': {'$exists': False}, 'friends.index': {'$in': indexes}},
+                              ['index', 'friends']):
+        yield doc['index'], friend_indexes(doc.get('friends'))
+
+
+def shortest_path(model, source, target, max_depth=MAX_DEPTH, timeout=TIMEOUT):
+    '''
+    Shortest list of indexes from ``source`` to ``target`` where each
+    person lists the next one as a friend, None when there is none
+    within ``max_depth`` hops.
+
+    Bidirectional breadth first search: the smaller frontier is expanded
+    each round with one ``$in`` query, forwards over the friends of the
+    frontier, backwards over the people listing it as a friend. Raises
+    PathTimeout once ``timeout`` seconds have passed.
+    '''
+    if source == target:
+        return [source]
+    deadline = default_timer() + timeout
+    # parent towards source / next hop towards target, and hops from each end
+    forward, backward = {source: None}, {target: None}
+    forward_depth, backward_depth = {source: 0}, {target: 0}
+    forward_frontier, backward_frontier = [source], [target]
+    best = None
+
+    def check_deadline():
+        if default_timer() > deadline:
+            raise PathTimeout('No path from {} to {} found in {}s'.format(source, target, timeout))
+
+    depth = 0
+    while forward_frontier and backward_frontier and depth < max_depth and best is None:
+        check_deadline()
+        depth += 1
+        discovered = []
+        if len(forward_frontier) <= len(backward_frontier):
+            for parent, friends in _friends(model, forward_frontier):
+                check_deadline()
+                for friend in friends:
+                    if friend in forward:
+                        continue
+                    forward[friend] = parent
+                    forward_depth[friend] = forward_depth[parent] + 1
+                    discovered.append(friend)
+                    if friend in backward:
+                        length = forward_depth[friend] + backward_depth[friend]
+                        if best is None or length < best[0]:
+                            best = (length, friend)
+            forward_frontier = discovered
+        else:
+            frontier = set(backward_frontier)
+            for person, friends in _listing(model, backward_frontier):
+                check_deadline()
+                if person in backward:
+                    continue
+                # any listed frontier member is one hop closer to target
+                next_hop = min(frontier.intersection(friends))
+                backward[person] = next_hop
+                backward_depth[person] = backward_depth[next_hop] + 1
+                discovered.append(person)
+                if person in forward:
+                    length = forward_depth[person] + backward_depth[person]
+                    if best is None or length < best[0]:
+                        best = (length, person)
+            backward_frontier = discovered
+
+    log.debug('path {} -> {}: {} rounds, {} forward {} backward visited'.format(
+        source, target, depth, len(forward), len(backward)))
+    if best is None or best[0] > max_depth:
+        return None
+    meet = best[1]
+    return list(reversed(_chain(forward, meet))) + _chain(backward, backward[meet])
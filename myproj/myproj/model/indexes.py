@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Versioned index synchronization, see ``gearbox paranuara-indexes``."""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+
+from ming import mim
+from ming.odm import Mapper
+from pymongo.errors import PyMongoError
+
+from myproj.model.session import mainsession
+
+log = logging.getLogger(__name__)
+
+__all__ = ['INDEX_SYNC_MODES', 'index_manifest', 'manifest_version', 'stored_manifest_version',
+           'indexes_current', 'build_progress', 'sync_indexes', 'ensure_unique_indexes', 'start_index_sync',
+           'current_index_sync', 'init_indexes']
+
+#: what init_model does when the stored manifest is not the current one
+INDEX_SYNC_MODES = ('foreground', 'background', 'off')
+
+MANIFEST_COLLECTION = 'index_manifest'
+MANIFEST_ID = 'indexes'
+POLL_INTERVAL = 10.0
+
+_sync_thread = None
+_sync_lock = threading.Lock()
+
+
+def _indexed_classes():
+    # mappers without a collection of their own have nothing to index
+    return sorted((mapper.collection for mapper in Mapper.all_mappers() if mapper.collection.m.collection_name),
+                  key=lambda cls: cls.m.collection_name)
+
+
+def index_manifest():
+    '''
+    [collection, spec, options] of every index declared in the mappers __mongometa__
+    '''
+    manifest = []
+    for cls in _indexed_classes():
+        for idx in cls.m.indexes:
+            manifest.append([cls.m.collection_name, [list(key) for key in idx.index_spec],
+                             sorted(idx.index_options.items())])
+    return sorted(manifest)
+
+
+def manifest_version(manifest=None):
+    '''
+    Digest of the index manifest, changes whenever an index is added, removed or altered
+    '''
+    manifest = index_manifest() if manifest is None else manifest
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _manifests():
+    return mainsession.db[MANIFEST_COLLECTION]
+
+
+def stored_manifest_version():
+    '''
+    Version recorded by the last completed sync_indexes, None if there was none
+    '''
+    doc = _manifests().find_one({'_id': MANIFEST_ID}, {'version': 1})
+    return doc.get('version') if doc else None
+
+
+def indexes_current():
+    '''
+    Whether the datastore has every index currently declared, one find_one
+    '''
+    return stored_manifest_version() == manifest_version()
+
+
+def build_progress():
+    '''
+    Progress messages of the index builds running on the server
+    '''
+    db = mainsession.db
+    if isinstance(db, mim.Database):
+        return []
+    try:
+        ops = db.client.admin.command('currentOp').get('inprog', [])
+    except PyMongoError:
+        # not allowed to see other operations
+        return []
+    return ['{} {}'.format(op.get('ns'), op['msg']) for op in ops
+            if 'Index Build' in (op.get('msg') or '')]
+
+
+def _ensure_index(cls, idx, poll, report, background=True):
+    if poll is None:
+        mainsession.ensure_index(cls, idx.index_spec, background=background, **idx.index_options)
+        return
+    # the call blocks until the build completes, report its progress meanwhile
+    errors = []
+
+    def build():
+        try:
+            mainsession.ensure_index(cls, idx.index_spec, background=True, **idx.index_options)
+        except Exception as e:
+            errors.append(e)
+
+    builder = threading.Thread(target=build, name='index-build')
+    builder.start()
+    builder.join(poll)
+    while builder.is_alive():
+        for message in build_progress():
+            report(message)
+        builder.join(poll)
+    if errors:
+        raise errors[0]
+
+
+def sync_indexes(force=False, report=log.info, poll=POLL_INTERVAL):
+    '''
+    Build the declared indexes in the background unless the stored
+    manifest already matches, then record the new manifest.
+    Returns how many indexes were ensured. Progress is sent to
+    ``report`` every ``poll`` seconds, None builds without polling.
+    '''
+    manifest = index_manifest()
+    version = manifest_version(manifest)
+    if not force and stored_manifest_version() == version:
+        return 0
+
+    pending = [(cls, idx) for cls in _indexed_classes() for idx in cls.m.indexes]
+    for position, (cls, idx) in enumerate(pending, 1):
+        report('index {}/{} {} {}'.format(position, len(pending), cls.m.collection_name,
+                                          ', '.join(key for key, _ in idx.index_spec)))
+        _ensure_index(cls, idx, poll, report)
+
+    _manifests().update_one({'_id': MANIFEST_ID}, {'$set': {
+        'version': version, 'manifest': manifest, 'synced_at': datetime.utcnow()}}, upsert=True)
+    report('indexes synchronized, manifest {}'.format(version))
+    return len(pending)
+
+
+def ensure_unique_indexes(report=log.info):
+    '''
+    Build the declared unique indexes in the foreground, they must exist
+    before the first write. Does not record the manifest.
+    Returns how many indexes were ensured.
+    '''
+    unique = [(cls, idx) for cls in _indexed_classes() for idx in cls.m.indexes
+              if idx.index_options.get('unique')]
+    for cls, idx in unique:
+        report('unique index {} {}'.format(cls.m.collection_name, ', '.join(key for key, _ in idx.index_spec)))
+        _ensure_index(cls, idx, None, report, background=False)
+    return len(unique)
+
+
+class IndexSyncThread(threading.Thread):
+    '''
+    Runs sync_indexes off the request path, its progress goes to the log
+    '''
+
+    def __init__(self):
+        super(IndexSyncThread, self).__init__(name='index-sync')
+        self.daemon = True
+        self.error = None
+
+    def run(self):
+        try:
+            sync_indexes()
+        except Exception as e:
+            self.error = e
+            log.exception('background index synchronization failed')
+
+
+def current_index_sync():
+    '''
+    The running IndexSyncThread of this process, if any
+    '''
+    thread = _sync_thread
+    return thread if thread is not None and thread.is_alive() else None
+
+
+def start_index_sync():
+    '''
+    Start an IndexSyncThread unless one is already running
+    '''
+    global _sync_thread
+    with _sync_lock:
+        if current_index_sync() is None:
+            _sync_thread = IndexSyncThread()
+            _sync_thread.start()
+        return _sync_thread
+
+
+def init_indexes(mode):
+    '''
+    init_model hook: skip when the manifest matches, otherwise sync
+    according to ``mode``, one of INDEX_SYNC_MODES
+    '''
+    if mode not in INDEX_SYNC_MODES:
+        raise ValueError('ming.index_sync must be one of {}, not {!r}'.format(', '.join(INDEX_SYNC_MODES), mode))
+    if isinstance(mainsession.db, mim.Database):
+        # nothing to build in memory, and the unique indexes must be there right away
+        mode = 'foreground'
+    if mode == 'foreground':
+        sync_indexes(poll=None)
+    elif indexes_current():
+        log.debug('index manifest is current')
+    elif mode == 'background':
+        log.info('index manifest changed, synchronizing indexes in the background')
+        # writes are taken as soon as init_model returns, no duplicate may get in meanwhile
+        ensure_unique_indexes()
+        start_index_sync()
+    else:
+        log.warning('index manifest changed, run gearbox paranuara-indexes to build the indexes')
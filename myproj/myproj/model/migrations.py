@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Batched online data migrations, run with ``gearbox paranuara-migrate``."""
+import logging
+
+from pymongo import UpdateOne
+
+from myproj.model.friendgraph import friend_indexes
+from myproj.model.paranuara import People, classify_foods, reconcile_headcounts
+
+log = logging.getLogger(__name__)
+
+__all__ = ['MIGRATIONS', 'BATCHED_MIGRATIONS', 'backfill_foods', 'backfill_friend_ids']
+
+
+def _bulk_update(collection, updates):
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def _backfill(name, spec, fields, changes, batch_size):
+    '''
+    $set ``changes(doc)`` on every People document matching ``spec``, in
+    unordered batches of ``batch_size`` so readers and writers keep going
+    '''
+    collection = People.query.mapper.collection.m.collection
+    updated = 0
+    updates = []
+    for doc in collection.find(spec, dict((f, 1) for f in fields)):
+        updates.append(UpdateOne({'_id': doc['_id']}, {'$set': changes(doc), '$inc': {'_rev': 1}}))
+        if len(updates) >= batch_size:
+            updated += _bulk_update(collection, updates)
+            updates = []
+            log.info('backfill {} {} people updated'.format(name, updated))
+    updated += _bulk_update(collection, updates)
+    return updated
+
+
+def backfill_foods(batch_size=1000):
+    '''
+    Populate the derived People fruits/vegetables for documents written
+    before they existed
+    '''
+    def changes(doc):
+        fruits, vegetables = classify_foods(doc.get('favouriteFood'))
+        return {'fruits': fruits, 'vegetables': vegetables}
+    return _backfill('foods', {'fruits': {'$exists': False}}, ['favouriteFood'], changes, batch_size)
+
+
+def backfill_friend_ids(batch_size=1000):
+    '''
+    Populate the People friend_ids int array from friends for documents
+    written before it existed
+    '''
+    def changes(doc):
+        return {'friend_ids': list(friend_indexes(doc.get('friends')))}
+    return _backfill('friend ids', {'friend_ids': {'$exists': False}}, ['friends'], changes, batch_size)
+
+
+MIGRATIONS = {
+    'foods': backfill_foods,
+    'friend-ids': backfill_friend_ids,
+    'headcounts': reconcile_headcounts,
+}
+
+#: migrations updating documents in ``batch_size`` batches
+BATCHED_MIGRATIONS = ('foods', 'friend-ids')
@@ -1,16 +1,150 @@
+from collections import defaultdict
+from timeit import default_timer
+from ming import mim
 from ming import schema as s
 from ming.odm import FieldProperty, ForeignIdProperty, RelationProperty, FieldPropertyWithMissingNone
-from ming.odm import Mapper
+from ming.odm import Mapper, MapperExtension
 from ming.odm.declarative import MappedClass
 from myproj.model import DBSession
+from myproj.model.friendgraph import FriendGraph, FriendGraphExtension, friend_indexes
+from myproj.model.snapshot import PeopleSnapshot
+from myproj.model.raw import RawQuery
+from myproj.model.session import record_query
 import re
 
+
+FRUITS = set(['apple',
+ 'banana', 
+ 'cucumber',
+ 'orange',
+ 'strawberry'])
+
+VEGETABLES = set([ 'beetroot',
+ 'carrot',
+ 'celery',
+])
+
+
+def classify_foods(foods):
+    '''
+    Split favourite foods into (fruits, vegetables)
+    '''
+    foods = set(foods or [])
+    return sorted(FRUITS & foods), sorted(VEGETABLES & foods)
+
+
+class FoodsExtension(MapperExtension):
+    '''
+    Keeps the derived fruits/vegetables of People in sync with favouriteFood
+    '''
+    def before_insert(self, instance, state, sess):
+        instance.fruits, instance.vegetables = classify_foods(instance.favouriteFood)
+
+    def before_update(self, instance, state, sess):
+        self.before_insert(instance, state, sess)
+
+
+class FriendIdsExtension(MapperExtension):
+    '''
+    Keeps the People friend_ids int array in sync with friends
+    '''
+    def before_insert(self, instance, state, sess):
+        instance.friend_ids = list(friend_indexes(instance.friends))
+
+    def before_update(self, instance, state, sess):
+        self.before_insert(instance, state, sess)
+
+
+class RevisionExtension(MapperExtension):
+    '''
+    Bumps the document ``_rev`` on every write, it versions the resource ETag.
+    A ``_rev`` coming with the written data is ignored, the count goes on
+    from the one loaded from mongodb.
+    '''
+    def before_insert(self, instance, state, sess):
+        original = state.original_document or {}
+        instance._rev = (original.get('_rev') or 0) + 1
+
+    def before_update(self, instance, state, sess):
+        self.before_insert(instance, state, sess)
+
+
+#: Company counters only ever written by adjust_headcounts and reconcile_headcounts
+HEADCOUNT_FIELDS = ('employee_count', 'alive_count')
+
+
+class HeadcountFieldsExtension(MapperExtension):
+    '''
+    Company employee_count/alive_count coming with the written data are
+    ignored. ODM updates ``$set`` every other field instead of saving the
+    whole document, so they never undo the increments of People writes
+    landed since the company was loaded.
+    '''
+    def before_insert(self, instance, state, sess):
+        # people already listing the company are counted by reconcile_headcounts
+        for name in HEADCOUNT_FIELDS:
+            setattr(instance, name, 0)
+
+    def before_update(self, instance, state, sess):
+        original = state.original_document or {}
+        for name in HEADCOUNT_FIELDS:
+            setattr(instance, name, original.get(name) or 0)
+        state.options['fields'] = tuple(
+            name for name in state.document if name != '_id' and name not in HEADCOUNT_FIELDS)
+
+
+class HeadcountExtension(MapperExtension):
+    '''
+    Keeps the Company employee_count/alive_count counters in sync with the
+    company_id/has_died of People writes, see adjust_headcounts
+    '''
+    def _written(self, instance, state, before):
+        after = headcount_key(instance) if instance is not None else None
+        adjust_headcounts(headcount_deltas(before, after))
+        if state is not None:
+            state.extra_state['headcount'] = after
+
+    def _before(self, state):
+        if 'headcount' in state.extra_state:
+            return state.extra_state['headcount']
+        # as loaded from mongodb
+        return headcount_key(state.original_document) if state.original_document else None
+
+    def after_insert(self, instance, state, sess):
+        self._written(instance, state, None)
+
+    def after_bulk_insert(self, docs):
+        deltas = None
+        for doc in docs:
+            deltas = headcount_deltas(None, headcount_key(doc), deltas)
+        adjust_headcounts(deltas or {})
+
+    def after_update(self, instance, state, sess):
+        self._written(instance, state, self._before(state))
+
+    def after_delete(self, instance, state, sess):
+        self._written(None, state, self._before(state))
+
+
+def revision_etag(_id, rev, fields=None):
+    '''
+    Strong ETag of the document ``_id`` at revision ``rev``. ``_rev`` starts
+    over when a document is removed and written again, its new ``_id`` keeps
+    the tag apart. A projection on ``fields`` is a different representation
+    so it gets its own tag
+    '''
+    etag = '{}-{}'.format(_id, rev or 0)
+    if fields:
+        etag += '-' + '+'.join(fields)
+    return etag
+
+
 class EmailSchema(s.FancySchemaItem):
     regex = re.compile(r'[\w\.\+\-]+\@[\w]+\.[a-z]{2,3}$')
 
     def _validate(self, value, **kw):
         if not self.regex.match(value):
-            raise schema.Invalid('Not a valid email address', value)
+            raise s.Invalid('Not a valid email address', value, None)
         return value
 
 class People(MappedClass):
@@ -21,9 +155,16 @@ class People(MappedClass):
         session = DBSession
         name = 'people'
         unique_indexes = [('index',)]
-        indexes = [('company_id',)]
+        # multikey, answers "who lists me as a friend" in index order for
+        # the followers and path search. friends.index does the same for the
+        # documents written before friend_ids, drop it once
+        # gearbox paranuara-migrate friend-ids ran everywhere
+        indexes = [('company_id', 'index'), ('index', '_rev', '_id'), ('friend_ids', 'index'),
+                   ('friends.index',)]
+        extensions = [FriendGraphExtension, FoodsExtension, FriendIdsExtension, RevisionExtension, HeadcountExtension]
 
     _id = FieldProperty(s.ObjectId)
+    _rev = FieldProperty(s.Int(if_missing=0))
     about = FieldProperty(s.String(if_missing=''))
     address = FieldProperty(s.String(if_missing=''))
     age = FieldProperty(s.Int(required=True))
@@ -36,7 +177,12 @@ class People(MappedClass):
     email = FieldProperty(EmailSchema, required=False)
     eyeColor = FieldProperty(s.String)
     favouriteFood = FieldProperty(s.Array(s.String))
+    # derived from favouriteFood on write
+    fruits = FieldProperty(s.Array(s.String))
+    vegetables = FieldProperty(s.Array(s.String))
     friends = FieldProperty(s.Array(s.Anything))
+    # derived from friends on write, sorted unique friend indexes
+    friend_ids = FieldProperty(s.Array(s.Int))
     gender = FieldProperty(s.String)
     greeting = FieldProperty(s.String(if_missing=''))
     guid = FieldProperty(s.String)
@@ -49,6 +195,9 @@ class People(MappedClass):
     registered = FieldProperty(s.Anything(required=False, if_missing=''))
     tags = FieldProperty(s.Array(s.String))
 
+People.friend_graph = FriendGraph(People)
+People.snapshot = PeopleSnapshot(People)
+People.raw = RawQuery(People)
 
 class Company(MappedClass):
     '''
@@ -58,10 +207,18 @@ class Company(MappedClass):
         session = DBSession
         name = 'company'
         unique_indexes = [('index',)]
+        indexes = [('index', '_rev', '_id')]
+        extensions = [HeadcountFieldsExtension, RevisionExtension]
 
     _id = FieldProperty(s.ObjectId)
+    _rev = FieldProperty(s.Int(if_missing=0))
     index = FieldProperty(s.Int(required=True))
     company = FieldProperty(s.String(required=True))
+    # People with this company_id and the alive ones among them, maintained
+    # by HeadcountExtension and recomputed by reconcile_headcounts, read only
+    # through the ODM, see HeadcountFieldsExtension
+    employee_count = FieldProperty(s.Int(if_missing=0))
+    alive_count = FieldProperty(s.Int(if_missing=0))
 
 
     @property
@@ -71,3 +228,143 @@ class Company(MappedClass):
         '''
         return People.query.find(dict(company_id=self.index, has_died=False)).all()
 
+    def iter_employees(self, after=None, limit=None, fields=None):
+        return iter_employees(self.index, after=after, limit=limit, fields=fields)
+
+    def employees_page(self, after=None, limit=None, fields=None):
+        return list(self.iter_employees(after=after, limit=limit, fields=fields))
+
+
+Company.raw = RawQuery(Company)
+
+EMPLOYEE_FIELDS = ['name', 'age', 'address', 'phone', 'index', 'email', 'company_id']
+
+
+def iter_employees(company_id, after=None, limit=None, fields=None):
+    '''
+    Alive Employees of ``company_id`` ordered by index, starting after the
+    ``after`` index. Yields plain dicts with only ``fields`` projected server side.
+    '''
+    fields = fields or EMPLOYEE_FIELDS
+    filters = dict(company_id=company_id, has_died=False)
+    if after is not None:
+        filters['index'] = {'$gt': after}
+    cursor = People.raw.find(filters, fields, sort=[('index', 1)], limit=limit)
+    for doc in cursor:
+        yield dict([(k, doc.get(k)) for k in fields])
+
+
+def employee_food_counts(company_id=None):
+    '''
+    How many alive employees like each fruit and vegetable, per company.
+    Returns {company_id: {'fruits': {food: count}, 'vegetables': {food: count}}}
+    for ``company_id`` only or for every company.
+    '''
+    match = dict(has_died=False, favouriteFood={'$in': sorted(FRUITS | VEGETABLES)})
+    if company_id is not None:
+        match['company_id'] = company_id
+    collection = People.raw.collection
+
+    counts = defaultdict(lambda: defaultdict(int))
+    if isinstance(collection, mim.Collection):
+        # MIM aggregate has no $unwind/$group, count in process
+        for doc in People.raw.find(match, ['company_id', 'favouriteFood']):
+            for food in set(doc.get('favouriteFood') or []):
+                counts[doc.get('company_id')][food] += 1
+    else:
+        pipeline = [
+            {'$match': match},
+            # a person listing a food twice still counts once
+            {'$project': {'company_id': 1, 'favouriteFood': {'$setUnion': ['$favouriteFood', []]}}},
+            {'$unwind': '$favouriteFood'},
+            {'$match': {'favouriteFood': match['favouriteFood']}},
+            {'$group': {
+                '_id': {'company_id': '$company_id', 'food': '$favouriteFood'},
+                'count': {'$sum': 1}}},
+        ]
+        for row in People.raw.aggregate(pipeline):
+            counts[row['_id'].get('company_id')][row['_id']['food']] += row['count']
+
+    result = {}
+    for company, foods in counts.items():
+        result[company] = dict(
+            fruits=dict((k, v) for k, v in foods.items() if k in FRUITS),
+            vegetables=dict((k, v) for k, v in foods.items() if k in VEGETABLES))
+    return result
+
+
+def headcount_key(doc):
+    '''
+    (company_id, alive) of a People document or instance
+    '''
+    return (getattr(doc, 'company_id', None), getattr(doc, 'has_died', None) is False)
+
+
+def headcount_deltas(before, after, deltas=None):
+    '''
+    Company counter changes of a person going from the ``before`` to the
+    ``after`` headcount_key, None for not existing. Accumulates in ``deltas``:
+    {company_id: {'employee_count': n, 'alive_count': n}}
+    '''
+    deltas = deltas if deltas is not None else {}
+    for key, sign in [(before, -1), (after, 1)]:
+        if key is None or key[0] is None:
+            continue
+        company_id, alive = key
+        counters = deltas.setdefault(company_id, {'employee_count': 0, 'alive_count': 0})
+        counters['employee_count'] += sign
+        if alive:
+            counters['alive_count'] += sign
+    return deltas
+
+
+def adjust_headcounts(deltas):
+    '''
+    Apply headcount_deltas with one atomic $inc per changed company
+    '''
+    collection = Company.raw.collection
+    for company_id, counters in deltas.items():
+        inc = dict((k, v) for k, v in counters.items() if v)
+        if not inc:
+            continue
+        # the counters are part of the company representation
+        inc['_rev'] = 1
+        started = default_timer()
+        collection.update_one({'index': company_id}, {'$inc': inc})
+        record_query(elapsed=default_timer() - started)
+
+
+def reconcile_headcounts():
+    '''
+    Recompute every Company employee_count/alive_count from People in one
+    aggregation pass, returns how many companies were corrected.
+    Increments racing with it are lost, run it again once writes settle.
+    '''
+    collection = People.raw.collection
+    counts = defaultdict(lambda: {'employee_count': 0, 'alive_count': 0})
+    if isinstance(collection, mim.Collection):
+        # MIM aggregate has no $group, count in process
+        for doc in People.raw.find({'company_id': {'$ne': None}}, ['company_id', 'has_died']):
+            counters = counts[doc['company_id']]
+            counters['employee_count'] += 1
+            counters['alive_count'] += doc.get('has_died') is False
+    else:
+        pipeline = [
+            {'$match': {'company_id': {'$ne': None}}},
+            {'$group': {
+                '_id': '$company_id',
+                'employee_count': {'$sum': 1},
+                'alive_count': {'$sum': {'$cond': [{'$eq': ['$has_died', False]}, 1, 0]}}}},
+        ]
+        for row in People.raw.aggregate(pipeline):
+            counts[row['_id']] = {'employee_count': row['employee_count'], 'alive_count': row['alive_count']}
+
+    companies = Company.raw.collection
+    corrected = 0
+    for company in Company.raw.find({}, ['_id', 'index', 'employee_count', 'alive_count']):
+        expected = counts[company['index']]
+        if all(company.get(k) == v for k, v in expected.items()):
+            continue
+        companies.update_one({'_id': company['_id']}, {'$set': expected, '$inc': {'_rev': 1}})
+        corrected += 1
+    return corrected
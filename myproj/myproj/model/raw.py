@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Read-only pymongo access to mapped classes, bypassing the ODM session."""
+from timeit import default_timer
+
+from ming.odm import FieldProperty, mapper
+
+from myproj.model.serializers import compile_serializer
+from myproj.model.session import record_query, query_shape
+
+__all__ = ['RawQuery', 'RawCursor', 'projection']
+
+SERIALIZER_CACHE_SIZE = 256
+
+
+def projection(fields):
+    '''
+    pymongo projection for the ``fields`` names, ``_id`` is only
+    returned when listed. None projects the whole document.
+    '''
+    if fields is None:
+        return None
+    spec = dict([(k, 1) for k in fields])
+    spec.setdefault('_id', 0)
+    return spec
+
+
+class RawCursor(object):
+    '''
+    Iterates a pymongo cursor accounting the documents and the time spent
+    fetching them to the request query stats
+    '''
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def batch_size(self, batch_size):
+        # MIM cursors fetch nothing in batches
+        set_batch_size = getattr(self.cursor, 'batch_size', None)
+        if set_batch_size is not None:
+            set_batch_size(batch_size)
+        return self
+
+    def __iter__(self):
+        cursor = iter(self.cursor)
+        while True:
+            started = default_timer()
+            try:
+                doc = next(cursor)
+            except StopIteration:
+                record_query(queries=0, elapsed=default_timer() - started)
+                return
+            record_query(queries=0, documents=1, elapsed=default_timer() - started)
+            yield doc
+
+
+class RawQuery(object):
+    '''
+    Projected queries against the collection of ``model`` returning plain
+    dicts, the same datastore the ODM uses without identity map bookkeeping,
+    validation on load or object construction.
+
+    Meant for read only endpoints, writes still go through the ODM so the
+    mapper extensions run.
+    '''
+
+    def __init__(self, model):
+        self.model = model
+        self._field_names = None
+        self._serializers = {}
+
+    @property
+    def collection(self):
+        return self.model.query.mapper.collection.m.collection
+
+    @property
+    def field_names(self):
+        '''
+        Names of the model FieldProperty, in declaration order
+        '''
+        if self._field_names is None:
+            self._field_names = [prop.name for prop in mapper(self.model).properties
+                                 if isinstance(prop, FieldProperty)]
+        return self._field_names
+
+    def dictify(self, doc):
+        '''
+        ``doc`` with a key for every model field, like the ODM objects are
+        rendered, fields missing in the document are None
+        '''
+        if doc is None:
+            return None
+        return dict([(k, doc.get(k)) for k in self.field_names])
+
+    def serializer(self, fields=None):
+        '''
+        Compiled function of a document returning its ``fields`` (default:
+        every field, as dictify) as JSON types, see compile_serializer
+        '''
+        key = tuple(fields) if fields else None
+        serialize = self._serializers.get(key)
+        if serialize is None:
+            if len(self._serializers) >= SERIALIZER_CACHE_SIZE:
+                # fields come from the request, bound the distinct selections kept
+                self._serializers.clear()
+            serialize = self._serializers[key] = compile_serializer(self.model, fields or None)
+        return serialize
+
+    def find(self, spec=None, fields=None, sort=None, limit=None, skip=None, hint=None):
+        '''
+        pymongo cursor of the documents matching ``spec``, ``hint`` names
+        the index to use as a list of (key, direction)
+        '''
+        kwargs = {}
+        if sort:
+            kwargs['sort'] = sort
+        if limit:
+            kwargs['limit'] = limit
+        if skip:
+            kwargs['skip'] = skip
+        collection = self.collection
+        record_query(shape=query_shape(self.model.__name__, spec))
+        cursor = collection.find(spec or {}, projection(fields), **kwargs)
+        if hint:
+            cursor = cursor.hint(hint)
+        return RawCursor(cursor)
+
+    def get(self, fields=None, **spec):
+        '''
+        The first document matching ``spec`` or None
+        '''
+        collection = self.collection
+        started = default_timer()
+        doc = collection.find_one(spec, projection(fields))
+        record_query(documents=0 if doc is None else 1, elapsed=default_timer() - started,
+                     shape=query_shape(self.model.__name__, spec))
+        return doc
+
+    def aggregate(self, pipeline):
+        '''
+        Aggregation results as a list
+        '''
+        started = default_timer()
+        rows = list(self.collection.aggregate(pipeline))
+        record_query(documents=len(rows), elapsed=default_timer() - started)
+        return rows
+
+    def estimated_count(self):
+        '''
+        Document count from the collection metadata, no scan
+        '''
+        collection = self.collection
+        record_query()
+        # collections answer any attribute with a sub-collection, look it up on the class
+        if callable(getattr(type(collection), 'estimated_document_count', None)):
+            return collection.estimated_document_count()
+        # pymongo < 3.7, count without a filter reads the same metadata
+        return collection.count()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Per model serializers compiled from the FieldProperty declarations."""
+from datetime import date, datetime
+
+from bson import ObjectId
+from ming import schema as s
+from ming.odm import FieldProperty, mapper
+
+__all__ = ['plain', 'compile_serializer']
+
+#: schema types whose values are already JSON types
+_NATIVE = (s.Int, s.Float, s.String, s.Bool)
+
+
+def _oid(value):
+    return str(value) if value is not None else None
+
+
+def _datetime(value):
+    # same text as the TG json renderer gives
+    return str(value) if value is not None else None
+
+
+def plain(value):
+    '''
+    ``value`` with ObjectId and datetime turned into strings at any depth,
+    for the values whose schema does not tell their type
+    '''
+    if isinstance(value, dict):
+        return dict((k, plain(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return str(value)
+    return value
+
+
+def _array_of(convert):
+    def convert_array(values):
+        return [convert(v) for v in values] if values is not None else None
+    return convert_array
+
+
+def _converter(schema):
+    '''
+    Function turning a value of ``schema`` into a JSON type, None when it already is one
+    '''
+    if isinstance(schema, s.ObjectId):
+        return _oid
+    if isinstance(schema, s.DateTime):
+        return _datetime
+    if isinstance(schema, _NATIVE):
+        return None
+    if isinstance(schema, s.Array):
+        convert = _converter(schema.field_type)
+        return _array_of(convert) if convert is not None else None
+    return plain
+
+
+def compile_serializer(model, fields=None):
+    '''
+    Function of a raw ``model`` document returning the dict of ``fields``
+    (default: every FieldProperty) ready for any JSON encoder.
+
+    The body is generated once from the field declarations, values whose
+    type needs no conversion are copied as is, missing fields are None.
+    '''
+    schemas = dict((prop.name, prop.field.schema) for prop in mapper(model).properties
+                   if isinstance(prop, FieldProperty))
+    if fields is None:
+        fields = [prop.name for prop in mapper(model).properties if isinstance(prop, FieldProperty)]
+    namespace = {}
+    items = []
+    for position, name in enumerate(fields):
+        convert = _converter(schemas[name]) if name in schemas else plain
+        if convert is None:
+            items.append('{!r}: get({!r})'.format(name, name))
+        else:
+            namespace['convert_{}'.format(position)] = convert
+            items.append('{!r}: convert_{}(get({!r}))'.format(name, position, name))
+    source = 'def serialize(doc):\n    get = doc.get\n    return {{{}}}\n'.format(', '.join(items))
+    exec(compile(source, '<{} serializer>'.format(model.__name__), 'exec'), namespace)
+    serialize = namespace['serialize']
+    serialize.fields = list(fields)
+    return serialize
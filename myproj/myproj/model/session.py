@@ -1,5 +1,124 @@
+import logging
+import sys
+import threading
+from collections import Counter
+from timeit import default_timer
+
 from ming import Session
 from ming.odm import ThreadLocalODMSession
+from ming.odm.odmsession import SessionExtension
+
+log = logging.getLogger(__name__)
+
+#: the same query shape repeated this many times in a request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 10
+
+_local = threading.local()
+
+
+class QueryStats(object):
+    '''
+    Queries, documents returned and time spent in the database during a request
+    '''
+
+    def __init__(self):
+        self.queries = 0
+        self.documents = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, queries=1, documents=0, elapsed=0.0, shape=None):
+        self.queries += queries
+        self.documents += documents
+        self.db_time += elapsed
+        if shape is not None:
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        '''
+        Query shapes issued at least ``threshold`` times, likely N+1 patterns
+        '''
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def __repr__(self):
+        return 'queries={} documents={} db_time={:.1f}ms'.format(
+            self.queries, self.documents, self.db_time * 1000.0)
+
+
+def query_shape(collection, spec=None):
+    '''
+    (collection, sorted filter keys) identifying the same query with other values
+    '''
+    return (collection, tuple(sorted(spec or {})))
+
+
+def start_query_stats():
+    _local.stats = QueryStats()
+    return _local.stats
+
+
+def stop_query_stats():
+    stats = getattr(_local, 'stats', None)
+    _local.stats = None
+    return stats
+
+
+def current_query_stats():
+    return getattr(_local, 'stats', None)
+
+
+def record_query(*args, **kw):
+    '''
+    Account a query to the request being served, if any
+    '''
+    stats = current_query_stats()
+    if stats is not None:
+        stats.record(*args, **kw)
+
+
+class QueryStatsExtension(SessionExtension):
+    '''
+    Accounts the queries, documents and cursor time of the ODM session
+    '''
+
+    def __init__(self, session):
+        super(QueryStatsExtension, self).__init__(session)
+        self._started = None
+
+    def cursor_created(self, cursor, action, *args, **kw):
+        # options/limit/sort/... derive a new cursor from the same query
+        if action == 'find':
+            spec = args[1] if len(args) > 1 and isinstance(args[1], dict) else None
+            record_query(shape=query_shape(args[0].__name__, spec))
+
+    def before_cursor_next(self, cursor):
+        self._started = default_timer()
+
+    def after_cursor_next(self, cursor):
+        elapsed = default_timer() - self._started if self._started is not None else 0.0
+        # called from a finally, the StopIteration of an exhausted cursor is no document
+        exhausted = sys.exc_info()[0] is StopIteration
+        record_query(queries=0, documents=0 if exhausted else 1, elapsed=elapsed)
+
+    def before_flush(self, obj=None):
+        self._started = default_timer()
+
+    def after_flush(self, obj=None):
+        if self._started is not None:
+            record_query(queries=0, elapsed=default_timer() - self._started)
+
+    def before_insert(self, obj, st):
+        record_query()
+
+    def before_update(self, obj, st):
+        record_query()
+
+    def before_delete(self, obj, st):
+        record_query()
+
+    def before_remove(self, cls, *args, **kwargs):
+        record_query()
+
 
 mainsession = Session()
-DBSession = ThreadLocalODMSession(mainsession)
\ No newline at end of file
+DBSession = ThreadLocalODMSession(mainsession, extensions=[QueryStatsExtension])
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""Compact read-only snapshot of the people collection, held in column arrays."""
+import logging
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from timeit import default_timer
+
+from bson import ObjectId
+
+log = logging.getLogger(__name__)
+
+__all__ = ['PeopleSnapshot', 'StringTable', 'SNAPSHOT_FIELDS']
+
+#: People fields held by the snapshot, lookups of other fields go to the database
+SNAPSHOT_FIELDS = ['_id', 'index', '_rev', 'age', 'company_id', 'has_died', 'eyeColor',
+                   'name', 'email', 'phone', 'address', 'gender']
+
+_INT_FIELDS = ['index', '_rev', 'age', 'company_id']
+_STRING_FIELDS = ['name', 'email', 'phone', 'address', 'gender']
+
+#: int column value of a missing field
+_NULL = -(2 ** 31)
+
+#: bytes of an ObjectId in the _id column, all zeros when missing
+_ID_SIZE = 12
+_NULL_ID = bytes(_ID_SIZE)
+
+#: has_died codes
+_DIED = {None: -1, False: 0, True: 1}
+_DIED_VALUES = {-1: None, 0: False, 1: True}
+
+#: changed people read back per query on refresh
+REFRESH_BATCH_SIZE = 1000
+
+#: share of changed people above which refresh rebuilds instead of splicing
+#: rows, when more than REBUILD_MIN_CHANGES people changed
+REBUILD_RATIO = 0.1
+REBUILD_MIN_CHANGES = 1000
+
+#: covered by the (index, _rev, _id) index declared on People
+_REVISION_INDEX = [('index', 1), ('_rev', 1), ('_id', 1)]
+
+
+class StringTable(object):
+    '''
+    Interned strings, every distinct value is held once and columns keep
+    its code. Code 0 is None. Only ever appended to, so readers of an
+    older column set can share it with a refresh in progress.
+    '''
+    __slots__ = ('strings', 'codes')
+
+    def __init__(self):
+        self.strings = [None]
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.strings) - 1
+
+    def code(self, value):
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def memory_usage(self):
+        return (sys.getsizeof(self.strings) + sys.getsizeof(self.codes) +
+                sum(sys.getsizeof(value) for value in self.strings[1:]))
+
+
+class _Columns(object):
+    '''
+    One version of the snapshot data, rows ordered by index. Not modified
+    once published, refresh works on a copy.
+    '''
+    __slots__ = ('ids', 'ints', 'died', 'eyes', 'strings', 'companies', 'eye_table', 'string_table')
+
+    def __init__(self, eye_table=None, string_table=None):
+        self.ids = bytearray()
+        self.ints = dict((name, array('l')) for name in _INT_FIELDS)
+        self.died = array('b')
+        self.eyes = array('H')
+        self.strings = dict((name, array('l')) for name in _STRING_FIELDS)
+        self.companies = {}
+        self.eye_table = eye_table or StringTable()
+        self.string_table = string_table or StringTable()
+
+    def __len__(self):
+        return len(self.ints['index'])
+
+    def copy(self):
+        columns = _Columns(self.eye_table, self.string_table)
+        columns.ids = self.ids[:]
+        columns.ints = dict((name, column[:]) for name, column in self.ints.items())
+        columns.died = self.died[:]
+        columns.eyes = self.eyes[:]
+        columns.strings = dict((name, column[:]) for name, column in self.strings.items())
+        columns.companies = dict((company_id, people[:]) for company_id, people in self.companies.items())
+        return columns
+
+    def row(self, index):
+        indexes = self.ints['index']
+        row = bisect_left(indexes, index)
+        if row < len(indexes) and indexes[row] == index:
+            return row
+        return None
+
+    def _values(self, doc):
+        return (_id_bytes(doc.get('_id')), [_int(doc.get(name)) for name in _INT_FIELDS], _DIED[doc.get('has_died')],
+                self.eye_table.code(doc.get('eyeColor')),
+                [self.string_table.code(doc.get(name)) for name in _STRING_FIELDS])
+
+    def append(self, doc):
+        _id, ints, died, eye, strings = self._values(doc)
+        self.ids += _id
+        for name, value in zip(_INT_FIELDS, ints):
+            self.ints[name].append(value)
+        self.died.append(died)
+        self.eyes.append(eye)
+        for name, value in zip(_STRING_FIELDS, strings):
+            self.strings[name].append(value)
+        self.companies.setdefault(ints[_INT_FIELDS.index('company_id')], array('l')).append(doc['index'])
+
+    def insert(self, doc):
+        row = bisect_left(self.ints['index'], doc['index'])
+        if row == len(self):
+            self.append(doc)
+            return
+        _id, ints, died, eye, strings = self._values(doc)
+        self.ids[row * _ID_SIZE:row * _ID_SIZE] = _id
+        for name, value in zip(_INT_FIELDS, ints):
+            self.ints[name].insert(row, value)
+        self.died.insert(row, died)
+        self.eyes.insert(row, eye)
+        for name, value in zip(_STRING_FIELDS, strings):
+            self.strings[name].insert(row, value)
+        people = self.companies.setdefault(ints[_INT_FIELDS.index('company_id')], array('l'))
+        people.insert(bisect_left(people, doc['index']), doc['index'])
+
+    def delete(self, row):
+        # strings left unused stay in the tables until the next build
+        index, company_id = self.ints['index'][row], self.ints['company_id'][row]
+        del self.ids[row * _ID_SIZE:(row + 1) * _ID_SIZE]
+        for column in list(self.ints.values()) + list(self.strings.values()) + [self.died, self.eyes]:
+            del column[row]
+        people = self.companies[company_id]
+        del people[bisect_left(people, index)]
+        if not people:
+            del self.companies[company_id]
+
+    def object_id(self, row):
+        value = bytes(self.ids[row * _ID_SIZE:(row + 1) * _ID_SIZE])
+        return None if value == _NULL_ID else ObjectId(value)
+
+    def document(self, row, fields):
+        doc = {}
+        for name in fields:
+            if name == '_id':
+                doc[name] = self.object_id(row)
+            elif name in self.ints:
+                value = self.ints[name][row]
+                doc[name] = None if value == _NULL else value
+            elif name in self.strings:
+                doc[name] = self.string_table.strings[self.strings[name][row]]
+            elif name == 'has_died':
+                doc[name] = _DIED_VALUES[self.died[row]]
+            elif name == 'eyeColor':
+                doc[name] = self.eye_table.strings[self.eyes[row]]
+        return doc
+
+
+class PeopleSnapshot(object):
+    '''
+    SNAPSHOT_FIELDS of every person in column arrays, rows ordered by index
+
+    Ints are array('l') columns, _id the 12 bytes of each ObjectId, strings are codes into interned string
+    tables, has_died and eyeColor one byte / two bytes per person. Lookups
+    by index bisect the index column, company_id maps to the sorted array
+    of its people indexes.
+
+    refresh() walks the covered (index, _rev, _id) index in index order next
+    to the index column and only reads back the people whose ``_rev`` or
+    ``_id`` (removed and written again) changed.
+    The changes are applied to a copy of the columns which then replaces
+    the published one: lookups never wait for a refresh, and hold on to
+    the columns they started with. With ``max_age`` (seconds) set, a
+    lookup finding the snapshot older than that starts a refresh in a
+    background thread and answers from the current columns meanwhile.
+    '''
+
+    def __init__(self, model, max_age=None):
+        self.model = model
+        self.enabled = False
+        self.max_age = max_age
+        # serializes build and refresh, lookups take no lock
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Drop the snapshot, it is lazily built on next access
+        '''
+        with self._lock:
+            self._columns = None
+            self._refreshed = None
+
+    @property
+    def built(self):
+        return self._columns is not None
+
+    def __len__(self):
+        columns = self._columns
+        return len(columns) if columns is not None else 0
+
+    def covers(self, fields):
+        '''
+        Whether every one of ``fields`` is held by the snapshot
+        '''
+        return bool(fields) and all(name in SNAPSHOT_FIELDS for name in fields)
+
+    def build(self):
+        '''
+        Load every person in a single projected pass ordered by index
+        '''
+        with self._lock:
+            self._build()
+
+    def _build(self):
+        started = default_timer()
+        columns = _Columns()
+        for doc in self.model.raw.find({}, SNAPSHOT_FIELDS, sort=[('index', 1)]):
+            columns.append(doc)
+        self._columns, self._refreshed = columns, default_timer()
+        log.debug('people snapshot built with {} people in {:.3f}s'.format(
+            len(columns), self._refreshed - started))
+
+    def refresh(self):
+        '''
+        Bring the snapshot up to date with the collection, only the people
+        inserted, updated or removed since the last refresh are touched.
+        Returns how many people changed.
+        '''
+        with self._lock:
+            current = self._columns
+            if current is None:
+                self._build()
+                return len(self._columns)
+            started = default_timer()
+            changed, removed = self._changes(current)
+            if len(changed) + len(removed) > max(REBUILD_MIN_CHANGES, REBUILD_RATIO * len(current)):
+                # splicing rows one by one costs more than reading everything again
+                self._build()
+                return len(changed) + len(removed)
+            if changed or removed:
+                columns = current.copy()
+                for index in removed:
+                    columns.delete(columns.row(index))
+                for start in range(0, len(changed), REFRESH_BATCH_SIZE):
+                    batch = changed[start:start + REFRESH_BATCH_SIZE]
+                    for doc in self.model.raw.find({'index': {'$in': batch}}, SNAPSHOT_FIELDS):
+                        row = columns.row(doc['index'])
+                        if row is not None:
+                            columns.delete(row)
+                        columns.insert(doc)
+                self._columns = columns
+            self._refreshed = default_timer()
+            log.debug('people snapshot refreshed {} changed {} removed in {:.3f}s'.format(
+                len(changed), len(removed), self._refreshed - started))
+            return len(changed) + len(removed)
+
+    def _changes(self, columns):
+        '''
+        ([changed or new indexes], [removed indexes]) of ``columns``, from
+        one ordered scan of the (index, _rev, _id) index merged with the index column
+        '''
+        indexes, revs = columns.ints['index'], columns.ints['_rev']
+        changed, removed = [], []
+        row, rows = 0, len(indexes)
+        for doc in self.model.raw.find({}, ['index', '_rev', '_id'], sort=[('index', 1)], hint=_REVISION_INDEX):
+            index = doc['index']
+            while row < rows and indexes[row] < index:
+                removed.append(indexes[row])
+                row += 1
+            if row < rows and indexes[row] == index:
+                if revs[row] != _int(doc.get('_rev')) or columns.object_id(row) != doc.get('_id'):
+                    changed.append(index)
+                row += 1
+            else:
+                changed.append(index)
+        removed.extend(indexes[row:])
+        return changed, removed
+
+    def current_refresh(self):
+        '''
+        The running background refresh thread, if any
+        '''
+        thread = self._thread
+        return thread if thread is not None and thread.is_alive() else None
+
+    def start_refresh(self):
+        '''
+        Start a background refresh unless one is already running
+        '''
+        with self._thread_lock:
+            if self.current_refresh() is None:
+                self._thread = threading.Thread(target=self._refresh_in_background, name='people-snapshot')
+                self._thread.daemon = True
+                self._thread.start()
+            return self._thread
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            # try again after max_age rather than on every lookup
+            self._refreshed = default_timer()
+            log.exception('people snapshot refresh failed')
+
+    def _current(self):
+        columns = self._columns
+        if columns is None:
+            with self._lock:
+                if self._columns is None:
+                    self._build()
+                return self._columns
+        if self.max_age is not None and default_timer() - self._refreshed > self.max_age:
+            self.start_refresh()
+        return columns
+
+    def get(self, index, fields=None):
+        '''
+        Dict of ``fields`` (default: SNAPSHOT_FIELDS) of person ``index``, None when unknown
+        '''
+        columns = self._current()
+        row = columns.row(index)
+        return columns.document(row, fields or SNAPSHOT_FIELDS) if row is not None else None
+
+    def employees(self, company_id, after=None, limit=None, fields=None):
+        '''
+        Dicts of ``fields`` of the alive employees of ``company_id`` ordered
+        by index, starting after the ``after`` index, as iter_employees
+        '''
+        fields = fields or SNAPSHOT_FIELDS
+        columns = self._current()
+        people = columns.companies.get(company_id, ())
+        start = bisect_right(people, after) if after is not None else 0
+        result = []
+        for index in people[start:]:
+            row = columns.row(index)
+            if columns.died[row] != 0:
+                continue
+            result.append(columns.document(row, fields))
+            if limit and len(result) >= limit:
+                break
+        return result
+
+    def memory_usage(self):
+        '''
+        Bytes held by each part of the snapshot and their ``total``, with
+        the ``people`` and ``distinct strings`` counts. A refresh holds a
+        second copy of the columns while it runs.
+        '''
+        columns = self._columns or _Columns()
+        usage = dict(('column ' + name, sys.getsizeof(column)) for name, column in columns.ints.items())
+        usage['column _id'] = sys.getsizeof(columns.ids)
+        usage.update(('column ' + name, sys.getsizeof(column)) for name, column in columns.strings.items())
+        usage['column has_died'] = sys.getsizeof(columns.died)
+        usage['column eyeColor'] = sys.getsizeof(columns.eyes)
+        usage['strings'] = columns.string_table.memory_usage() + columns.eye_table.memory_usage()
+        usage['companies'] = sys.getsizeof(columns.companies) + sum(
+            sys.getsizeof(company_id) + sys.getsizeof(people) for company_id, people in columns.companies.items())
+        usage['total'] = sum(usage.values())
+        usage['people'] = len(columns)
+        usage['distinct strings'] = len(columns.string_table)
+        return usage
+
+
+def _int(value):
+    return _NULL if value is None else int(value)
+
+
+def _id_bytes(value):
+    return value.binary if isinstance(value, ObjectId) else _NULL_ID
@@ -9,8 +9,9 @@ from tg import config
 from tg.util import Bunch
 
 from myproj import model
+from myproj.lib.querystats import QUERIES_HEADER
 
-__all__ = ['setup_app', 'setup_db', 'teardown_db', 'TestController']
+__all__ = ['setup_app', 'setup_db', 'teardown_db', 'assert_max_queries', 'TestController']
 
 application_name = 'main_without_authn'
 
@@ -47,6 +48,13 @@ def teardown_db():
         datastore.db.command("dropDatabase")
 
 
+def assert_max_queries(response, maximum):
+    """Fail when the request behind ``response`` ran more than ``maximum`` queries."""
+    queries = int(response.headers[QUERIES_HEADER])
+    assert queries <= maximum, '{} queries, expected at most {}: {}'.format(
+        queries, maximum, response.request.url)
+
+
 class TestController(object):
     """Base functional test case for the controllers.
 
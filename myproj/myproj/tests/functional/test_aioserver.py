@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests of the asyncio HTTP server (``use = egg:myproj#asyncio``).
+
+"""
+from __future__ import unicode_literals
+
+import asyncio
+import socket
+import threading
+from http.client import HTTPConnection
+
+from nose.tools import eq_, ok_
+
+from myproj.lib.aioserver import AsyncioWSGIServer
+
+
+def echo_app(environ, start_response):
+    """Answers the pool thread and request body, in chunks without a Content-Length"""
+    body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [threading.current_thread().name.encode('latin-1'), b' ', body]
+
+
+class TestAsyncioWSGIServer(object):
+    """Requests over a socket to the server running on its own thread"""
+
+    def setUp(self):
+        self.server = AsyncioWSGIServer(echo_app, port=0, threads=2, slow_threads=1,
+                                        default_threads=1, max_body_size=64, keep_alive_timeout=0.5)
+        self.listening = self.server.start()
+        asyncio.set_event_loop(None)
+        self.thread = threading.Thread(target=self.server.loop.run_forever)
+        self.thread.start()
+        self.connection = HTTPConnection(self.server.host, self.server.port, timeout=10)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.loop.call_soon_threadsafe(self.server.loop.stop)
+        self.thread.join()
+        self.server.close(self.listening)
+
+    def request(self, method, url, body=None, headers={}, **kw):
+        self.connection.request(method, url, body=body, headers=headers, **kw)
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_pool_for(self):
+        """Reads of the people and companies routes get their own pools"""
+        pool_for = self.server.pool_for
+        eq_([pool_for('GET', '/people/1.json'), pool_for('HEAD', '/companies'),
+             pool_for('GET', '/people/1/common_friends/2.json'), pool_for('GET', '/people/1/suggestions.json'),
+             pool_for('GET', '/people/1/path/2.json'), pool_for('POST', '/people.json'),
+             pool_for('GET', '/peoples'), pool_for('GET', '/')],
+            ['read', 'read', 'slow', 'slow', 'slow', 'default', 'default', 'default'])
+
+    def test_routed_to_pool(self):
+        """The application runs on the thread pool of the route"""
+        for url, method, pool in [('/people/1.json', 'GET', 'read'),
+                                  ('/people/1/common_friends/2.json', 'GET', 'slow'),
+                                  ('/people.json', 'POST', 'default')]:
+            response, body = self.request(method, url, body=b'')
+            ok_(body.startswith(('aioserver-' + pool + '_').encode('latin-1')), (url, body))
+
+    def test_keep_alive(self):
+        """HTTP/1.1 connections stay open until the client asks to close"""
+        self.request('GET', '/people.json')
+        sock = self.connection.sock
+        ok_(sock is not None)
+        response, _ = self.request('GET', '/people.json')
+        ok_(self.connection.sock is sock)
+        response, _ = self.request('GET', '/people.json', headers={'Connection': 'close'})
+        eq_(response.getheader('Connection'), 'close')
+        ok_(self.connection.sock is None)
+
+    def test_chunked_response(self):
+        """Responses without a Content-Length are sent chunked"""
+        response, body = self.request('POST', '/people.json', body=b'{"index": 1}')
+        eq_(response.getheader('Transfer-Encoding'), 'chunked')
+        ok_(body.endswith(b' {"index": 1}'), body)
+
+    def test_chunked_request(self):
+        """Chunked request bodies are decoded for the application"""
+        response, body = self.request('POST', '/people.json', body=iter([b'{"index"', b': 1}']),
+                                      encode_chunked=True)
+        eq_(response.status, 200)
+        ok_(body.endswith(b' {"index": 1}'), body)
+
+    def test_body_too_large(self):
+        """Bodies over max_body_size are refused, chunked or not"""
+        response, _ = self.request('POST', '/people.json', body=b'x' * 65)
+        eq_((response.status, response.getheader('Connection')), (413, 'close'))
+        self.connection.close()
+        response, _ = self.request('POST', '/people.json', body=iter([b'x' * 60, b'x' * 5]),
+                                   encode_chunked=True)
+        eq_(response.status, 413)
+
+    def test_expect_continue(self):
+        """The body is only sent after the 100 Continue answer"""
+        sock = socket.create_connection((self.server.host, self.server.port), timeout=10)
+        try:
+            sock.sendall(b'POST /people.json HTTP/1.1\r\nHost: test\r\nContent-Length: 4\r\n'
+                         b'Expect: 100-continue\r\nConnection: close\r\n\r\n')
+            eq_(sock.recv(1024), b'HTTP/1.1 100 Continue\r\n\r\n')
+            sock.sendall(b'body')
+            response = b''
+            while True:
+                data = sock.recv(1024)
+                if not data:
+                    break
+                response += data
+        finally:
+            sock.close()
+        ok_(response.startswith(b'HTTP/1.1 200 OK') and b'\r\nbody\r\n' in response, response)
+
+    def test_idle_timeout(self):
+        """Idle keep-alive connections are closed after keep_alive_timeout"""
+        sock = socket.create_connection((self.server.host, self.server.port), timeout=10)
+        try:
+            eq_(sock.recv(1024), b'')
+        finally:
+            sock.close()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Functional tests of the lean JSON API application (the ``api`` factory).
+
+"""
+from __future__ import unicode_literals
+
+from nose.tools import ok_
+from tg import config
+
+from myproj.tests import TestController, load_app
+
+
+class TestApiApplication(TestController):
+    """The /people and /companies resources without the full TG2 stack"""
+
+    application_under_test = 'api'
+
+    def test_full_application_untouched(self):
+        """Loading the API leaves the process wide configuration to the full application"""
+        full = load_app()
+        load_app(self.application_under_test)
+        ok_('crud.resources' not in config and config['default_renderer'] == 'kajiki', config)
+        resp = full.get('/')
+        ok_('text/html' == resp.content_type, resp.content_type)
+
+    def test_person_json(self):
+        """People resource answers without a session cookie"""
+        resp = self.app.get('/people/2.json?fields=name')
+        ok_({'name': 'Bonnie Bass'} == resp.json['value'], resp.json)
+        ok_('Set-Cookie' not in resp.headers, resp.headers)
+
+    def test_company_employees(self):
+        """company/employee resource is mounted"""
+        resp = self.app.get('/companies/59/employees.json?fields=index')
+        ok_([{'index': 2}, {'index': 595}] == resp.json['value']['employees'], resp.json)
+
+    def test_only_api_mounted(self):
+        """Pages and admin of the full application are not served"""
+        self.app.get('/', status=404)
+        self.app.get('/admin', status=404)
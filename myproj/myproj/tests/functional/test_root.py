@@ -10,10 +10,12 @@ functional tests exercise the whole application and its WSGI stack.
 Please read http://pythonpaste.org/webtest/ for more information.
 
 """
+import json
 
 from nose.tools import ok_
 
-from myproj.tests import TestController
+from myproj import model
+from myproj.tests import TestController, assert_max_queries
 
 
 class TestRootController(TestController):
@@ -81,6 +83,50 @@ class TestParanuaraAPIController(TestController):
             resp.json
         )
         
+    def test_person_not_modified(self):
+        """People resource answers 304 when the ETag matches"""
+        resp = self.app.get('/people/0.json')
+        self.app.get('/people/0.json', headers={'If-None-Match': resp.headers['ETag']}, status=304)
+
+    def test_person_etag_not_from_snapshot(self):
+        """People resource ETag is checked against the database, not a stale snapshot"""
+        snapshot = model.People.snapshot
+        enabled, max_age = snapshot.enabled, snapshot.max_age
+        snapshot.enabled, snapshot.max_age = True, None
+        try:
+            snapshot.build()
+            resp = self.app.get('/people/0.json?fields=name,age')
+            person = model.People.query.get(index=0)
+            person.age = 99
+            model.DBSession.flush()
+            model.DBSession.clear()
+            resp = self.app.get('/people/0.json?fields=name,age',
+                                headers={'If-None-Match': resp.headers['ETag']}, status=200)
+        finally:
+            snapshot.enabled, snapshot.max_age = enabled, max_age
+            snapshot.reset()
+
+    def test_company_etag_changes(self):
+        """Company resource ETag changes when the company is updated"""
+        resp = self.app.get('/companies/59.json')
+        company = model.Company.query.get(index=59)
+        company.company = 'BRAINCLIP2'
+        model.DBSession.flush()
+        model.DBSession.clear()
+        resp = self.app.get('/companies/59.json', headers={'If-None-Match': resp.headers['ETag']}, status=200)
+        ok_('BRAINCLIP2' == resp.json['value']['company'], resp.json)
+
+    def test_company_etag_recreated(self):
+        """Company resource ETag changes when the company is removed and added again"""
+        resp = self.app.get('/companies/59.json')
+        data = dict(resp.json['value'], _rev=7)
+        data.pop('_id')
+        model.Company.query.remove({'index': 59})
+        self.app.post_json(url='/companies.json', params=data, status=200)
+        recreated = self.app.get('/companies/59.json', headers={'If-None-Match': resp.headers['ETag']}, status=200)
+        ok_((1, True) == (recreated.json['value']['_rev'], recreated.headers['ETag'] != resp.headers['ETag']),
+            recreated.headers)
+
     def test_unkown_person_json(self):
         """Unknown person returns value:null"""
         resp = self.app.get('/people/9999.json', status=404)
@@ -89,6 +135,52 @@ class TestParanuaraAPIController(TestController):
             resp.json
         )
 
+    def test_person_fields(self):
+        """People resource only returns the requested fields"""
+        resp = self.app.get('/people/2.json?fields=name,age')
+        ok_({'name': 'Bonnie Bass', 'age': 54} == resp.json['value'], resp.json)
+
+    def test_person_unknown_fields(self):
+        """People resource rejects fields that are not in the model"""
+        self.app.get('/people/2.json?fields=name,password', status=400)
+
+    def test_company_employees_fields(self):
+        """company/employee resource returns the requested employee fields"""
+        resp = self.app.get('/companies/59/employees.json?fields=name&limit=1')
+        ok_(
+            [{'name': 'Bonnie Bass'}] == resp.json['value']['employees'] and 2 == resp.json['value']['next'],
+            resp.json
+        )
+
+    def test_company_headcount(self):
+        """Company resource counts its employees and the alive ones"""
+        # bootstrap_data flushes companies and people together, count the fixture's own
+        model.reconcile_headcounts()
+        resp = self.app.get('/companies/59.json')
+        ok_((2, 2) == (resp.json['value']['employee_count'], resp.json['value']['alive_count']), resp.json)
+        person = model.People.query.get(index=2)
+        person.has_died = True
+        model.DBSession.flush()
+        model.DBSession.clear()
+        resp = self.app.get('/companies/59.json')
+        ok_((2, 1) == (resp.json['value']['employee_count'], resp.json['value']['alive_count']), resp.json)
+        ok_(0 == model.reconcile_headcounts())
+
+    def test_company_headcount_read_only(self):
+        """Company counters are neither taken from the request nor undone by ODM updates"""
+        resp = self.app.post_json(url='/companies.json', status=200,
+                                  params={"index": 4, "company": "BUGSALL", "employee_count": 999, "alive_count": -5})
+        ok_((0, 0) == (resp.json['value']['employee_count'], resp.json['value']['alive_count']), resp.json)
+        company = model.Company.query.get(index=4)
+        model.Company.raw.collection.update_one({'index': 4}, {'$inc': {'employee_count': 1, 'alive_count': 1}})
+        company.company = 'BUGSNONE'
+        company.employee_count = 999
+        model.DBSession.flush()
+        model.DBSession.clear()
+        resp = self.app.get('/companies/4.json')
+        ok_(('BUGSNONE', 1, 1) == tuple(resp.json['value'][name] for name in ['company', 'employee_count', 'alive_count']),
+            resp.json)
+
     def test_company_json(self):
         """Company resource returns a value"""
         resp = self.app.get('/companies/59.json')
@@ -106,6 +198,45 @@ class TestParanuaraAPIController(TestController):
             resp.json
         )
 
+    def test_bulk_add_companies(self):
+        """Company bulk resource reports each item"""
+        data = [{"index" : 4, "company" : "BUGSALL"}, {"index" : 0, "company" : "NETBOOK"}, {"index" : 'x'}]
+        resp = self.app.post_json(url='/companies/bulk.json', params=data, status=200)
+        ok_(
+            1 == resp.json['value']['inserted'] and
+            ['inserted', 'duplicate', 'invalid'] == [r['status'] for r in resp.json['value']['results']],
+            resp.json
+        )
+
+    def test_bulk_add_after_duplicate(self):
+        """Company bulk resource inserts the items following a duplicate"""
+        data = [{"index" : 2, "company" : "ONE"}, {"index" : 0, "company" : "NETBOOK"}, {"index" : 3, "company" : "TWO"}]
+        resp = self.app.post_json(url='/companies/bulk.json', params=data, status=200)
+        ok_(['inserted', 'duplicate', 'inserted'] == [r['status'] for r in resp.json['value']['results']], resp.json)
+        self.app.get('/companies/3.json', status=200)
+
+    def test_bulk_add_employees(self):
+        """company/employee bulk resource adds employees to the company"""
+        # bootstrap_data flushes companies and people together, count the fixture's own
+        model.reconcile_headcounts()
+        data = [{'index': 10001, 'age': 30, 'name': 'New Emp', 'has_died': False},
+            {'index': 10002, 'age': 31, 'name': 'Other Emp', 'has_died': False, 'company_id': 1}]
+        resp = self.app.post_json(url='/companies/58/employees/bulk.json', params=data, status=200)
+        ok_(2 == resp.json['value']['inserted'], resp.json)
+        resp = self.app.get('/companies/58/employees.json')
+        ok_(
+            [10001, 10002] == [e['index'] for e in resp.json['value']['employees']],
+            resp.json
+        )
+        resp = self.app.get('/companies/58.json')
+        ok_((3, 2) == (resp.json['value']['employee_count'], resp.json['value']['alive_count']), resp.json)
+
+    def test_bulk_add_employees_unknown_company(self):
+        """company/employee bulk resource is not found for an unknown company"""
+        data = [{'index': 10001, 'age': 30, 'name': 'New Emp', 'has_died': False}]
+        self.app.post_json(url='/companies/9999/employees/bulk.json', params=data, status=404)
+        self.app.get('/people/10001.json', status=404)
+
     def test_company_has_employees(self):
         """company/employee resource returns list of employees"""
         resp = self.app.get('/companies/59/employees.json')
@@ -114,6 +245,78 @@ class TestParanuaraAPIController(TestController):
             resp.json
         )
 
+    def test_company_employees_queries(self):
+        """company/employee resource runs a fixed number of queries"""
+        resp = self.app.get('/companies/59/employees.json')
+        assert_max_queries(resp, 2)
+        # the company and its 2 alive employees
+        ok_('3' == resp.headers['X-DB-Documents'], resp.headers)
+
+    def test_company_employees_pages(self):
+        """company/employee resource pages employees by index"""
+        resp = self.app.get('/companies/59/employees.json?limit=1')
+        ok_(
+            [2] == [e['index'] for e in resp.json['value']['employees']] and 2 == resp.json['value']['next'],
+            resp.json
+        )
+        resp = self.app.get('/companies/59/employees.json?limit=1&after=2')
+        ok_(
+            [595] == [e['index'] for e in resp.json['value']['employees']] and None == resp.json['value']['next'],
+            resp.json
+        )
+
+    def test_company_employees_unpaged(self):
+        """company/employee resource returns every employee without after or limit"""
+        from myproj.controllers.paranuara import EmployeesAPIController
+        page_size = EmployeesAPIController.page_size
+        EmployeesAPIController.page_size = 1
+        try:
+            resp = self.app.get('/companies/59/employees.json')
+        finally:
+            EmployeesAPIController.page_size = page_size
+        ok_(
+            [2, 595] == [e['index'] for e in resp.json['value']['employees']] and None == resp.json['value']['next'],
+            resp.json
+        )
+
+    def test_company_employees_stream(self):
+        """company/employee resource streams employees as NDJSON"""
+        resp = self.app.get('/companies/59/employees.json?stream=1')
+        ok_(
+            resp.content_type == 'application/x-ndjson' and
+            [2, 595] == [json.loads(line)['index'] for line in resp.text.splitlines()],
+            resp.text
+        )
+
+    def test_people_stream(self):
+        """People resource streams every person as NDJSON"""
+        resp = self.app.get('/people.json?stream=1')
+        ok_(
+            [0, 2, 595] == [json.loads(line)['index'] for line in resp.text.splitlines()],
+            resp.text
+        )
+
+    def test_people_pages(self):
+        """People resource pages people by index"""
+        resp = self.app.get('/people.json?limit=2&total=1')
+        ok_(
+            [0, 2] == [p['index'] for p in resp.json['value_list']] and 2 == resp.json['next'] and 3 == resp.json['total'],
+            resp.json
+        )
+        resp = self.app.get('/people.json?limit=2&after=2')
+        ok_(
+            [595] == [p['index'] for p in resp.json['value_list']] and None == resp.json['next'],
+            resp.json
+        )
+
+    def test_companies_pages(self):
+        """Company resource pages companies by index"""
+        resp = self.app.get('/companies.json?after=0&fields=company')
+        ok_(
+            [{'company': 'JAMNATION'}, {'company': 'BRAINCLIP'}] == resp.json['value_list'] and 'total' not in resp.json,
+            resp.json
+        )
+
     def test_company_exclude_dead_employees(self):
         """company/employee resource returns empty employees list"""
         resp = self.app.get('/companies/58/employees.json')
@@ -124,6 +327,8 @@ class TestParanuaraAPIController(TestController):
 
     def test_company_add_employees(self):
         """company/employee resource add an employee"""
+        # bootstrap_data flushes companies and people together, count the fixture's own
+        model.reconcile_headcounts()
         person ={
                 '_id': '58dab52a6f4ae8b67d476745',
                 'about': 'I am a new employee', 
@@ -151,6 +356,8 @@ class TestParanuaraAPIController(TestController):
             (58 == resp.json['value']['company_id']) and person['_id'] == resp.json['value']['_id'] ,
             resp.json
         )
+        resp = self.app.get('/companies/58.json')
+        ok_((2, 1) == (resp.json['value']['employee_count'], resp.json['value']['alive_count']), resp.json)
 
     def test_common_friends(self):
         """default common friends"""
@@ -179,6 +386,94 @@ class TestParanuaraAPIController(TestController):
             resp.json
         )
 
+    def test_common_friends_queries(self):
+        """common_friends resource doesn't query per friend"""
+        resp = self.app.get('/people/2/common_friends/0.json')
+        assert_max_queries(resp, 3)
+
+    def test_common_friends_group(self):
+        """common friends of a group of people"""
+
+        resp = self.app.get('/people/595/common_friends.json?with=2,0&eyeColor=blue')
+        ok_(
+            (3 == len(resp.json['value']['people'])) and
+            ([0] == [p['index'] for p in resp.json['value']['common_friends']])  ,
+            resp.json
+        )
+
+    def test_common_friends_group_invalid(self):
+        """common friends of a group rejects non integer indexes"""
+
+        self.app.get('/people/595/common_friends.json?with=2,abc', status=400)
+
+    def test_common_friends_new_person(self):
+        """common friends include people posted after the friend graph was built"""
+
+        self.app.get('/people/595/common_friends/2.json')
+        person = {'age': 30, 'index': 10002, 'name': 'New Friend',
+            'email': 'newfriend@somewhere.com', 'friends': [{'index': 0}, {'index': 595}]}
+        self.app.post_json(url='/people.json', params=person, status=200)
+        resp = self.app.get('/people/595/common_friends/10002.json')
+        ok_(
+            ([0] == [p['index'] for p in resp.json['value']['common_friends']])  ,
+            resp.json
+        )
+
+    def test_suggestions(self):
+        """suggestions resource ranks friends of friends, without existing friends"""
+        resp = self.app.get('/people/595/suggestions.json')
+        ok_(
+            [(2, 1)] == [(p['index'], p['mutual_friends']) for p in resp.json['value']['suggestions']],
+            resp.json
+        )
+        resp = self.app.get('/people/595/suggestions.json?has_died=true')
+        ok_([] == resp.json['value']['suggestions'], resp.json)
+
+    def test_unknown_person_suggestions(self):
+        """suggestions resource returns 404 for unknown people"""
+        self.app.get('/people/9999/suggestions.json', status=404)
+
+    def test_path(self):
+        """path resource returns the shortest friendship chain"""
+        resp = self.app.get('/people/595/path/2.json')
+        ok_(
+            [595, 0, 2] == [p['index'] for p in resp.json['value']['path']] and 2 == resp.json['value']['length'],
+            resp.json
+        )
+        resp = self.app.get('/people/595/path/2.json?max_depth=1')
+        ok_(None == resp.json['value']['path'], resp.json)
+        resp = self.app.get('/people/2/path/595.json')
+        ok_(None == resp.json['value']['path'], resp.json)
+
+    def test_path_unknown_person(self):
+        """path resource returns 404 for unknown people"""
+        self.app.get('/people/2/path/9999.json', status=404)
+
+    def test_followers(self):
+        """followers resource pages the people listing a person as friend"""
+        resp = self.app.get('/people/0/followers.json?limit=2&fields=name')
+        ok_(
+            [{'name': 'Carmella Lambert'}, {'name': 'Bonnie Bass'}] == resp.json['value']['followers'] and
+            2 == resp.json['value']['next'],
+            resp.json
+        )
+        resp = self.app.get('/people/0/followers.json?after=2')
+        ok_([595] == [p['index'] for p in resp.json['value']['followers']], resp.json)
+        ok_(None == resp.json['value']['next'], resp.json)
+
+    def test_followers_before_migration(self):
+        """followers and path read friends of people not migrated to friend_ids"""
+        collection = model.People.query.mapper.collection.m.collection
+        collection.update_many({}, {'$unset': {'friend_ids': 1}})
+        resp = self.app.get('/people/0/followers.json?fields=index')
+        ok_([0, 2, 595] == [p['index'] for p in resp.json['value']['followers']], resp.json)
+        resp = self.app.get('/people/595/path/2.json')
+        ok_([595, 0, 2] == [p['index'] for p in resp.json['value']['path']], resp.json)
+
+    def test_followers_unknown_person(self):
+        """followers resource returns 404 for unknown people"""
+        self.app.get('/people/9999/followers.json', status=404)
+
     def test_fruits(self):
         """Test split fruits and vegetables"""
 
@@ -188,6 +483,27 @@ class TestParanuaraAPIController(TestController):
             resp.json
         )
 
+    def test_company_foods(self):
+        """company/foods resource counts alive employees food preferences"""
+        resp = self.app.get('/companies/59/foods.json')
+        ok_(
+            {'banana': 2, 'orange': 2, 'strawberry': 2} == resp.json['value']['fruits'] and
+            {'beetroot': 2} == resp.json['value']['vegetables'],
+            resp.json
+        )
+
+    def test_all_companies_foods(self):
+        """companies/foods resource counts food preferences for every company"""
+        resp = self.app.get('/companies/foods.json')
+        ok_(
+            [59] == [c['company_id'] for c in resp.json['value']['companies']],
+            resp.json
+        )
+
+    def test_unknown_person_foods(self):
+        """Unknown person foods returns not found"""
+        self.app.get('/people/9999/foods.json', status=404)
+
     def test_vegetables(self):
         """Test split fruits and vegetables"""
 
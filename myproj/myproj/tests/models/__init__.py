@@ -6,7 +6,7 @@ from tg import config
 from myproj.tests import load_app
 from myproj.tests import setup_db, teardown_db
 
-__all__ = ['ModelTest']
+__all__ = ['ModelTest', 'clear_db']
 
 
 def setup():
@@ -20,6 +20,19 @@ def teardown():
     teardown_db()
 
 
+def clear_db():
+    """Drop the data of the current datastore, teardown_db leaves MIM data the session still sees."""
+    datastore = config['pylons.app_globals'].ming_datastore
+    try:
+        # On MIM drop all data, the database the session uses is no longer
+        # listed by the connection once teardown_db dropped it
+        datastore.conn.clear_all()
+        datastore.db.clear()
+    except:
+        # On MongoDB drop database
+        datastore.db.command("dropDatabase")
+
+
 class ModelTest(object):
     """Base unit test case for the models."""
 
@@ -37,27 +50,12 @@ class ModelTest(object):
             self.obj.__mongometa__.session.clear()
             return self.obj
         except:
-            datastore = config['pylons.app_globals'].ming_datastore
-            try:
-                # On MIM drop all data
-                datastore.conn.clear_all()
-            except:
-                # On MongoDB drop database
-                # datastore.conn.drop_database(datastore.db)
-                datastore.db.command("dropDatabase")
-
+            clear_db()
             raise
 
     def tearDown(self):
         """Tear down test fixture for each model test method."""
-        datastore = config['pylons.app_globals'].ming_datastore
-        try:
-            # On MIM drop all data
-            datastore.conn.clear_all()
-        except:
-            # On MongoDB drop database
-            # datastore.conn.drop_database(datastore.db)
-            datastore.db.command("dropDatabase")
+        clear_db()
 
     def do_get_dependencies(self):
         """Get model test dependencies.
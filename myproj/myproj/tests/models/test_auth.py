@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """Test suite for the TG app's models"""
 from __future__ import unicode_literals
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 
 from myproj import model
 from myproj.tests.models import ModelTest
@@ -43,6 +43,25 @@ class TestUser(ModelTest):
         him = model.User.by_email_address("ignucius@example.org")
         eq_(him._id, self.obj._id)
 
+    def test_auth_cache_invalidated(self):
+        """Cached groups are dropped once the user or groups change"""
+        from myproj.config.app_cfg import base_config
+        metadata = base_config.sa_auth.authmetadata
+
+        eq_(metadata.get_groups(None, "ignucius"), [])
+        eq_(model.auth_cache.get("ignucius"), dict(user_id=self.obj._id, groups=(), permissions=()))
+
+        group = model.Group(group_name="test_group", display_name="Test Group")
+        model.DBSession.flush()
+        ok_(model.auth_cache.get("ignucius") is None)
+
+        user = model.User.query.get(user_name="ignucius")
+        eq_(metadata.get_user(None, "ignucius")._id, user._id)
+        user._groups = [group._id]
+        model.DBSession.flush()
+        model.DBSession.clear()
+        eq_(metadata.get_groups(None, "ignucius"), ["test_group"])
+
 
 class TestPermission(ModelTest):
     """Unit test case for the ``Permission`` model."""
@@ -94,6 +113,103 @@ class TestPeople(ModelTest):
         him = model.People.query.get(index=2)
         eq_(him._id, self.obj._id)
 
+    def test_raw_get(self):
+        """People.raw returns plain projected dicts"""
+        eq_(model.People.raw.get(fields=['name', 'age'], index=2), {'name': 'Bonnie Bass', 'age': 54})
+        him = model.People.raw.dictify(model.People.raw.get(index=2))
+        eq_((him['_id'], sorted(him)), (self.obj._id, sorted(model.People.raw.field_names)))
+
+    def test_raw_serializer(self):
+        """People.raw.serializer returns JSON types only"""
+        serialize = model.People.raw.serializer(['_id', 'name'])
+        eq_(serialize(model.People.raw.get(index=2)), {'_id': str(self.obj._id), 'name': 'Bonnie Bass'})
+        ok_(serialize is model.People.raw.serializer(['_id', 'name']))
+        eq_(sorted(model.People.raw.serializer()(model.People.raw.get(index=2))), sorted(model.People.raw.field_names))
+
+    def test_foods_classified(self):
+        """People favourite foods are split into fruits and vegetables on write"""
+        him = model.People.query.get(index=2)
+        eq_((him.fruits, him.vegetables), (['banana', 'orange', 'strawberry'], ['beetroot']))
+
+    def test_backfill_foods(self):
+        """The foods migration fills people written without fruits/vegetables"""
+        from myproj.model.migrations import backfill_foods
+        collection = model.People.query.mapper.collection.m.collection
+        collection.update_one({'index': 2}, {'$unset': {'fruits': 1, 'vegetables': 1}})
+        eq_(backfill_foods(), 1)
+        eq_(collection.find_one({'index': 2})['vegetables'], ['beetroot'])
+
+    def test_friend_ids(self):
+        """People friends are normalized into friend_ids on write"""
+        eq_(model.People.query.get(index=2).friend_ids, [0, 1, 2])
+
+    def test_backfill_friend_ids(self):
+        """The friend ids migration fills people written without friend_ids"""
+        from myproj.model.migrations import backfill_friend_ids
+        collection = model.People.query.mapper.collection.m.collection
+        collection.update_one({'index': 2}, {'$unset': {'friend_ids': 1}})
+        eq_(backfill_friend_ids(), 1)
+        eq_(collection.find_one({'index': 2})['friend_ids'], [0, 1, 2])
+
+    def test_friend_graph(self):
+        """People friends should be indexed in the friend graph"""
+        model.People.friend_graph.reset()
+        eq_(list(model.People.friend_graph.friends_of(2)), [0, 1, 2])
+        eq_(list(model.People.friend_graph.common_friends(2, 9999)), [])
+
+    def test_friend_graph_suggestions(self):
+        """Friends of friends are ranked by mutual friends"""
+        graph = model.People.friend_graph
+        graph.build()
+        for index, friends in [(10, [11, 12]), (11, [13, 14]), (12, [13, 10])]:
+            graph.update(index, [{'index': friend} for friend in friends])
+        eq_(graph.suggestions(10), [(13, 2), (14, 1)])
+        eq_(graph.suggestions(10, limit=1, max_fanout=1), [(13, 1)])
+
+    def test_friend_graph_update(self):
+        """The friend graph should follow updates to People friends"""
+        model.People.friend_graph.build()
+        him = model.People.query.get(index=2)
+        him.friends = [{'index': 5}, {'index': 1}]
+        model.DBSession.flush()
+        eq_(list(model.People.friend_graph.friends_of(2)), [1, 5])
+
+    def test_friend_graph_unbuilt_writes(self):
+        """Writes before the first build are read back by it, not kept in the overlay"""
+        graph = model.People.friend_graph
+        graph.reset()
+        graph.update(2, [{'index': 7}])
+        eq_((graph.built, graph._overlay), (False, {}))
+        eq_(list(graph.friends_of(2)), [0, 1, 2])
+
+    def test_friend_graph_max_age(self):
+        """A graph older than max_age is rebuilt with the writes of other processes"""
+        graph = model.People.friend_graph
+        graph.build()
+        collection = model.People.query.mapper.collection.m.collection
+        collection.update_one({'index': 2}, {'$set': {'friends': [{'index': 9}]}})
+        max_age, graph.max_age = graph.max_age, 0
+        try:
+            graph.friends_of(2)
+            thread = graph.current_rebuild()
+            if thread is not None:
+                thread.join()
+        finally:
+            graph.max_age = max_age
+        eq_(list(graph.friends_of(2)), [9])
+
+    def test_friend_graph_overlay_merged(self):
+        """Writes past the overlay size are merged into the CSR arrays"""
+        from myproj.model import friendgraph
+        graph = model.People.friend_graph
+        graph.build()
+        for index in range(friendgraph.OVERLAY_MERGE_SIZE + 1):
+            graph.update(1000 + index, [{'index': index}])
+        graph.discard(2)
+        eq_(len(graph._overlay), 1)
+        eq_((list(graph.friends_of(1000)), list(graph.friends_of(2000)), list(graph.friends_of(2))), ([0], [1000], []))
+        graph.reset()
+
 
 class TestCompany(ModelTest):
     """Unit test case for the ``Company`` model."""
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Test suite for the paranuara-import command"""
+from __future__ import unicode_literals
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from nose.tools import eq_
+
+from myproj import model
+from myproj.commands.importer import ImportCommand
+from myproj.lib.jsonstream import iter_json_array
+from myproj.tests.models import clear_db
+
+
+def test_iter_json_array():
+    """JSON arrays are read item by item across chunk boundaries"""
+    data = [{'index': 1, 'tags': ['a', ']']}, 12345, 'x', None]
+    eq_(list(iter_json_array(io.StringIO(json.dumps(data)), chunk_size=3)), data)
+
+
+class TestImportCommand(object):
+    """Unit test case for importing resource files."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'companies.json')
+        with open(self.filename, 'w') as f:
+            json.dump([{'index': i, 'company': 'COMPANY%s' % i} for i in range(5)] +
+                      [{'index': 'bad'}], f)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        clear_db()
+
+    def test_import(self):
+        """Valid companies are imported, invalid ones reported"""
+        counts = ImportCommand(None, None).import_file(model.Company, self.filename, 2, False)
+        eq_((counts['inserted'], counts['invalid']), (5, 1))
+        eq_(model.Company.query.find().count(), 5)
+
+    def test_resume(self):
+        """A resumed import skips the items in the checkpoint"""
+        command = ImportCommand(None, None)
+        command.write_checkpoint(self.filename, 3)
+        counts = command.import_file(model.Company, self.filename, 2, True)
+        eq_(counts['inserted'], 2)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Test suite for the versioned index synchronization"""
+from __future__ import unicode_literals
+
+from nose.tools import eq_, ok_
+
+from tg import config
+from tg.util import Bunch
+
+from myproj.commands import AppCommand
+from myproj.model import indexes
+from myproj.tests import setup_db, teardown_db
+
+
+class TestIndexes(object):
+    """Unit test case for the index manifest."""
+
+    def setUp(self):
+        setup_db()
+
+    def tearDown(self):
+        teardown_db()
+
+    def test_manifest_recorded(self):
+        """init_model records the manifest, the next sync has nothing to do"""
+        ok_(indexes.indexes_current())
+        eq_(indexes.sync_indexes(), 0)
+
+    def test_manifest_changed(self):
+        """A different stored manifest ensures every declared index again"""
+        indexes._manifests().update_one({'_id': indexes.MANIFEST_ID}, {'$set': {'version': 'old'}})
+        ok_(not indexes.indexes_current())
+        reports = []
+        eq_(indexes.sync_indexes(report=reports.append, poll=None), len(indexes.index_manifest()))
+        ok_(indexes.indexes_current(), reports)
+
+    def test_unique_indexes_first(self):
+        """The unique indexes are built before the background synchronization"""
+        unique = [entry for entry in indexes.index_manifest() if dict(entry[2]).get('unique')]
+        ok_(unique)
+        eq_(indexes.ensure_unique_indexes(report=lambda message: None), len(unique))
+
+    def test_command_settings(self):
+        """Commands load the application with their own settings, as paranuara-indexes --check does"""
+        AppCommand(None, None).load_app(Bunch(config_file='test.ini'), **{'ming.index_sync': 'off'})
+        eq_((config['ming.index_sync'], indexes.current_index_sync()), ('off', None))
+        AppCommand(None, None).load_app(Bunch(config_file='test.ini'))
+        eq_(config['ming.index_sync'], 'background')
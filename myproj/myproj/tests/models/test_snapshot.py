@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Test suite for the in-memory People snapshot"""
+from __future__ import unicode_literals
+
+from nose.tools import eq_, ok_
+
+from myproj import model
+from myproj.tests import setup_db
+from myproj.tests.models import clear_db
+
+
+class TestPeopleSnapshot(object):
+    """Unit test case for the column array People snapshot."""
+
+    def setUp(self):
+        setup_db()
+        # earlier suites leave data behind teardown_db
+        clear_db()
+        self.collection = model.People.raw.collection
+        self.collection.insert_many([
+            dict(index=i, _rev=1, age=20 + i, company_id=i % 2, has_died=i == 3,
+                 eyeColor='brown' if i % 2 else 'blue', name='Person {}'.format(i), gender='female')
+            for i in range(6)])
+        self.snapshot = model.People.snapshot
+        self.snapshot.reset()
+
+    def tearDown(self):
+        clear_db()
+
+    def test_get(self):
+        """People are looked up by index, missing fields are None"""
+        eq_(self.snapshot.get(3, ['name', 'age', 'has_died', 'eyeColor', 'email']),
+            {'name': 'Person 3', 'age': 23, 'has_died': True, 'eyeColor': 'brown', 'email': None})
+        eq_(self.snapshot.get(42), None)
+
+    def test_employees(self):
+        """Alive employees of a company ordered by index, paged after an index"""
+        eq_([e['index'] for e in self.snapshot.employees(1, fields=['index'])], [1, 5])
+        eq_([e['index'] for e in self.snapshot.employees(0, after=0, limit=1, fields=['index'])], [2])
+
+    def test_refresh(self):
+        """refresh only applies the people changed since the last build"""
+        self.snapshot.build()
+        self.collection.update_one({'index': 2}, {'$set': {'company_id': 1, 'age': 99}, '$inc': {'_rev': 1}})
+        self.collection.delete_one({'index': 5})
+        self.collection.delete_one({'index': 1})
+        self.collection.insert_many([dict(index=index, _rev=2, company_id=1, has_died=False) for index in (1, 7)])
+        eq_(self.snapshot.refresh(), 4)
+        eq_(self.snapshot.get(2, ['age']), {'age': 99})
+        eq_(self.snapshot.get(5), None)
+        eq_([e['index'] for e in self.snapshot.employees(1, fields=['index'])], [1, 2, 7])
+        eq_([e['index'] for e in self.snapshot.employees(0, fields=['index'])], [0, 4])
+        eq_(self.snapshot.refresh(), 0)
+
+    def test_refresh_recreated(self):
+        """refresh notices a person removed and written again at the same _rev"""
+        self.snapshot.build()
+        self.collection.delete_one({'index': 4})
+        self.collection.insert_one(dict(index=4, _rev=1, age=44, company_id=0, has_died=False))
+        _id = self.collection.find_one({'index': 4})['_id']
+        eq_(self.snapshot.refresh(), 1)
+        eq_(self.snapshot.get(4, ['_id', 'age']), {'_id': _id, 'age': 44})
+
+    def test_background_refresh(self):
+        """A lookup on a stale snapshot refreshes it in a background thread"""
+        self.snapshot.build()
+        self.collection.update_one({'index': 4}, {'$set': {'age': 77}, '$inc': {'_rev': 1}})
+        self.snapshot.max_age = 0
+        self.snapshot.get(4, ['age'])
+        thread = self.snapshot.current_refresh()
+        if thread is not None:
+            thread.join()
+        self.snapshot.max_age = None
+        eq_(self.snapshot.get(4, ['age']), {'age': 77})
+
+    def test_memory_usage(self):
+        """Strings are interned, the report totals every part"""
+        self.snapshot.build()
+        usage = self.snapshot.memory_usage()
+        eq_((usage['people'], usage['distinct strings']), (6, 7))
+        ok_(usage['total'] >= usage['strings'] + usage['column index'], usage)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Test suite for the synthetic dataset generator"""
+from __future__ import unicode_literals
+
+from nose.tools import eq_, ok_
+
+from myproj import model
+from myproj.lib.synthetic import load_synthetic, synthetic_people
+from myproj.tests.models import clear_db
+
+
+class TestSynthetic(object):
+    """Unit test case for synthetic datasets."""
+
+    def setUp(self):
+        # earlier suites leave data behind teardown_db
+        clear_db()
+
+    def tearDown(self):
+        clear_db()
+
+    def test_deterministic(self):
+        """The same seed generates the same people"""
+        eq_(list(synthetic_people(20, 2, seed=3)), list(synthetic_people(20, 2, seed=3)))
+
+    def test_load(self):
+        """Synthetic people are valid and befriend existing people"""
+        eq_(load_synthetic(200, 4, degree='uniform', mean_degree=5, died_ratio=0), (4, 200))
+        eq_(model.People.query.find(dict(has_died=True)).count(), 0)
+        friends = set(i for p in range(200) for i in model.People.friend_graph.friends_of(p))
+        ok_(friends and max(friends) < 200, friends)
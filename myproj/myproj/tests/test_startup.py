@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Import time profile of the application startup"""
+from __future__ import print_function, unicode_literals
+import sys
+
+from nose.plugins.skip import SkipTest
+from nose.tools import ok_
+
+from myproj.lib.importtime import import_profile, format_import_report
+
+#: only imported once enabled or first used
+LAZY_PACKAGES = ('tgext.admin', 'tgext.debugbar')
+
+
+def test_import_profile():
+    """Importing the application leaves the lazy packages out, prints the slowest imports"""
+    if sys.version_info < (3, 7):
+        raise SkipTest('-X importtime needs python 3.7 or later')
+    profile = import_profile('myproj.config.middleware', 'myproj.controllers.root')
+    # shown with nosetests -s or when failing
+    print(format_import_report(profile))
+    imported = [entry.name for entry in profile
+                if any(entry.name == p or entry.name.startswith(p + '.') for p in LAZY_PACKAGES)]
+    ok_(not imported, imported)
@@ -72,10 +72,22 @@ setup(
     ]},
     entry_points={
         'paste.app_factory': [
-            'main = myproj.config.middleware:make_app'
+            'main = myproj.config.middleware:make_app',
+            'api = myproj.config.middleware:make_api_app'
+        ],
+        'paste.server_runner': [
+            'asyncio = myproj.lib.aioserver:server_runner'
         ],
         'gearbox.plugins': [
-            'turbogears-devtools = tg.devtools'
+            'turbogears-devtools = tg.devtools',
+            'myproj = myproj'
+        ],
+        'gearbox.project_commands': [
+            'paranuara-import = myproj.commands.importer:ImportCommand',
+            'paranuara-migrate = myproj.commands.migrate:MigrateCommand',
+            'paranuara-bench = myproj.commands.bench:BenchCommand',
+            'paranuara-generate = myproj.commands.generate:GenerateCommand',
+            'paranuara-indexes = myproj.commands.indexes:IndexesCommand'
         ]
     },
     zip_safe=False